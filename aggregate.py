@@ -0,0 +1,151 @@
+# Sweep results aggregator
+#
+# Walks every case folder under a sweep directory, opens each statepoint
+# without linking the summary, reads only the energy flux and one-group
+# MGXS reaction-rate tallies, and writes everything to one columnar .npz.
+# Rows are cases, keyed by the (clad_type, radius, pitch, tag) columns.
+# The per-nuclide columns (fission_U235, ...) are macroscopic partial cross
+# sections, each nuclide's rate over the flux homogenized over the slice,
+# in 1/cm; they are not microscopic cross sections.
+#
+# usage: python aggregate.py [SWEEP_DIR] [OUTPUT.npz]
+
+import os
+import sys
+import glob
+import numpy as np
+from deck_cache import parse_case_folder
+
+RESULTS = "results.npz"
+MGXS_SCORES = ("fission", "nu-fission", "absorption", "total")
+
+
+def find_statepoints(root="."):
+	# {case folder: its last statepoint}
+	found = {}
+	for path in glob.glob(os.path.join(root, "*", "*", "statepoint.*.h5")):
+		folder = os.path.dirname(path)
+		if parse_case_folder(folder) is None:
+			continue
+		batch = int(path.split(".")[-2])
+		if folder not in found or batch > int(found[folder].split(".")[-2]):
+			found[folder] = path
+	return dict(sorted(found.items()))
+
+
+def _ratio(num, num_std, den, den_std):
+	value = num/den
+	std = abs(value)*np.sqrt((num_std/num)**2 + (den_std/den)**2)
+	return value, std
+
+
+def read_statepoint(path):
+	import openmc
+	row = {}
+	with openmc.StatePoint(path, autolink=False) as sp:
+		row["keff"] = sp.keff.nominal_value
+		row["keff_std"] = sp.keff.std_dev
+		flux = None
+		rates = {}
+		for tally in sp.tallies.values():
+			ftypes = [type(f) for f in tally.filters]
+			if ftypes == [openmc.EnergyFilter] and tally.scores == ["flux"]:
+				row["energy_bins"] = tally.filters[0].values
+				row["flux"] = tally.mean.ravel()
+				row["flux_std"] = tally.std_dev.ravel()
+			elif openmc.UniverseFilter in ftypes:
+				for score in tally.scores:
+					if score == "flux" and flux is None:
+						flux = (tally.get_values(scores=[score]).sum(),
+						        tally.get_values(scores=[score], value="std_dev").sum())
+					elif score == "scatter" and openmc.LegendreFilter in ftypes:
+						# P1 scattering moment, for the transport correction
+						for nuc in tally.nuclides:
+							kw = dict(scores=[score], nuclides=[nuc],
+							          filters=[openmc.LegendreFilter],
+							          filter_bins=[("P1",)])
+							rates.setdefault(("scatter-1", nuc), (
+								tally.get_values(**kw).sum(),
+								tally.get_values(value="std_dev", **kw).sum()))
+					elif score in MGXS_SCORES:
+						for nuc in tally.nuclides:
+							if (score, nuc) not in rates:
+								rates[score, nuc] = (
+									tally.get_values(scores=[score], nuclides=[nuc]).sum(),
+									tally.get_values(scores=[score], nuclides=[nuc],
+									                 value="std_dev").sum())
+	if flux is not None:
+		# One-group macroscopic partial cross sections of each nuclide;
+		# capture = absorption - fission and transport = total - P1 scatter
+		for (score, nuc), (rate, std) in rates.items():
+			if nuc == "total" or score == "scatter-1":
+				continue
+			row["{}_{}".format(score, nuc)], row["{}_{}_std".format(score, nuc)] = \
+				_ratio(rate, std, *flux)
+			if score == "absorption" and ("fission", nuc) in rates:
+				frate, fstd = rates["fission", nuc]
+				row["capture_" + nuc], row["capture_{}_std".format(nuc)] = _ratio(
+					rate - frate, np.hypot(std, fstd), *flux)
+			if score == "total" and ("scatter-1", nuc) in rates:
+				srate, sstd = rates["scatter-1", nuc]
+				row["transport_" + nuc], row["transport_{}_std".format(nuc)] = _ratio(
+					rate - srate, np.hypot(std, sstd), *flux)
+	return row
+
+
+def _column(values):
+	# Pad cases that are missing an array column with nan arrays
+	shape = next((np.shape(v) for v in values if np.ndim(v)), ())
+	return np.array([np.full(shape, np.nan) if v is None else v for v in values])
+
+
+def aggregate(root=".", output=RESULTS, stream=sys.stdout):
+	columns = {}
+	energy_bins = None
+	statepoints = find_statepoints(root)
+	n = len(statepoints)
+	for i, (folder, path) in enumerate(statepoints.items()):
+		case = parse_case_folder(folder)
+		case["tag"] = case["tag"] or ""
+		case["folder"] = os.path.relpath(folder, root)
+		row = dict(case, **read_statepoint(path))
+		bins = row.pop("energy_bins", None)
+		if energy_bins is None:
+			energy_bins = bins
+		for key, value in row.items():
+			columns.setdefault(key, [None]*i).append(value)
+		for key in columns.keys() - row.keys():
+			columns[key].append(None)
+		print("[{}/{}] {}".format(i + 1, n, case["folder"]), file=stream, flush=True)
+	arrays = {key: _column(values) for key, values in columns.items()}
+	if energy_bins is not None:
+		arrays["energy_bins"] = energy_bins
+	np.savez(output, **arrays)
+	return output
+
+
+def load_results(path=RESULTS):
+	with np.load(path) as data:
+		return {key: data[key] for key in data.files}
+
+
+def lookup(results, clad_type, radius, pitch, tag=None):
+	# Row index of a case, matching the folder name's rounding; tag None is
+	# the untagged case
+	mask = ((results["clad_type"] == clad_type) &
+	        np.isclose(results["radius"], round(radius, 2)) &
+	        np.isclose(results["pitch"], round(pitch, 2)) &
+	        (results["tag"] == (tag or "")))
+	rows = np.flatnonzero(mask)
+	if not len(rows):
+		raise KeyError((clad_type, radius, pitch, tag))
+	if len(rows) > 1:
+		raise ValueError("{} rows match {}: {}".format(
+			len(rows), (clad_type, radius, pitch, tag), results["folder"][rows].tolist()))
+	return rows[0]
+
+
+if __name__ == "__main__":
+	root = sys.argv[1] if len(sys.argv) > 1 else "."
+	output = sys.argv[2] if len(sys.argv) > 2 else RESULTS
+	print("Wrote", aggregate(root, output))
@@ -0,0 +1,260 @@
+# Benchmarks of the deck building and mechanical sizing hot paths
+#
+# Times each stage over 1, 100 and 1000 designs (a radius x pitch grid for
+# the decks): the median and the fastest of REPEAT runs, each from a fresh
+# setup. The peak memory that Python and NumPy allocated is measured in one
+# more run, apart from the timed ones, since tracemalloc slows allocation.
+# Results go to benchmarks/<commit>.json, so a later run can be compared
+# against them with --compare. Stages that need OpenMC are skipped without
+# it.
+#
+# usage: python benchmark.py [--counts 1 100 1000] [--stages ...]
+#                            [--repeat 3] [--compare COMMIT] [--no-save]
+
+import os
+import sys
+import json
+import time
+import tempfile
+import platform
+import contextlib
+import subprocess
+import tracemalloc
+import numpy as np
+from constants import PRESSURE_GAP, PRESSURE_MOD
+from gap import solve_rgap
+from sweep import stress_sweep
+from rpv import equivalent_radius, required_thickness
+
+RESULTS_DIR = "benchmarks"
+COUNTS = (1, 100, 1000)
+REPEAT = 3
+RADII = (1.5, 2.5)
+PITCHES = (8.0, 12.0)
+CLAD = "SS316"
+
+
+def designs(count):
+	# (radius, pitch) of `count` distinct decks
+	side = int(np.ceil(np.sqrt(count)))
+	radii = np.linspace(*RADII, side)
+	pitches = np.linspace(*PITCHES, side)
+	grid = np.stack(np.meshgrid(radii, pitches, indexing="ij"), axis=-1)
+	return [tuple(map(float, rp)) for rp in grid.reshape(-1, 2)[:count]]
+
+
+def _models(count):
+	from slice3d import Slice3D
+	return [Slice3D(r, p, CLAD) for r, p in designs(count)]
+
+
+# Each stage is (setup, run): setup(count) is not timed, and its result
+# is passed to run
+def _gap_setup(count):
+	return np.array([r for r, _ in designs(count)])
+
+
+def _gap_run(radii):
+	return solve_rgap(radii, PRESSURE_GAP, PRESSURE_MOD)
+
+
+def _pincell_setup(count):
+	# Import OpenMC and create the materials outside the timer
+	import pincell
+	from materials import all_materials
+	all_materials["Mod"]
+	return designs(count)
+
+
+def _pincell_run(cases):
+	from pincell import Pincell
+	from materials import all_materials
+	return [Pincell(r, CLAD, all_materials) for r, _ in cases]
+
+
+def _lattice_run(models):
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		return [m.get_lattice() for m in models]
+
+
+def _build_run(models):
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		for m in models:
+			m.build()
+
+
+def _built_models(count):
+	models = _models(count)
+	_build_run(models)
+	return models
+
+
+def _tallies_run(models):
+	with tempfile.TemporaryDirectory() as tmp:
+		for i, m in enumerate(models):
+			folder = os.path.join(tmp, str(i)) + "/"
+			os.makedirs(folder)
+			m.make_tallies(folder)
+
+
+def _export_run(models):
+	with tempfile.TemporaryDirectory() as tmp, \
+			open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		cwd = os.getcwd()
+		os.chdir(tmp)
+		try:
+			for m in models:
+				m.export_to_xml(force=True)
+		finally:
+			os.chdir(cwd)
+
+
+def _vessel_setup(count):
+	# The vessel_finder grid, with about `count` points
+	side = max(1, round(count**(1/3)))
+	return (np.linspace(0.69, 8, side), np.linspace(1.0, 2.0, side),
+	        np.linspace(0.02, 0.10, max(1, count//side**2)))
+
+
+def _vessel_run(grid):
+	return stress_sweep(*grid)
+
+
+def _rpv_setup(count):
+	return equivalent_radius(np.linspace(200, 300, count))
+
+
+def _rpv_run(radii):
+	return required_thickness(radii)
+
+
+# name: (setup, run, needs OpenMC)
+STAGES = {
+	"gap": (_gap_setup, _gap_run, False),
+	"pincell": (_pincell_setup, _pincell_run, True),
+	"lattice": (_models, _lattice_run, True),
+	"build": (_models, _build_run, True),
+	"make_tallies": (_built_models, _tallies_run, True),
+	"export_to_xml": (_models, _export_run, True),
+	"vessel_sweep": (_vessel_setup, _vessel_run, False),
+	"rpv_thickness": (_rpv_setup, _rpv_run, False),
+}
+
+
+def have_openmc():
+	try:
+		import openmc
+	except ImportError:
+		return False
+	return True
+
+
+def _setup(name, count):
+	setup, _, needs_openmc = STAGES[name]
+	if needs_openmc:
+		# Start every deck stage from empty geometry caches
+		import pincell
+		pincell.clear_cache()
+	return setup(count)
+
+
+def time_stage(name, count, repeat=REPEAT):
+	run = STAGES[name][1]
+	times = []
+	for _ in range(repeat):
+		args = _setup(name, count)
+		t0 = time.perf_counter()
+		run(args)
+		times.append(time.perf_counter() - t0)
+	args = _setup(name, count)
+	tracemalloc.start()
+	try:
+		run(args)
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	seconds = float(np.median(times))
+	return {"seconds": seconds, "min_seconds": min(times), "repeat": repeat,
+	        "per_design": seconds/count, "peak_mb": peak/2**20}
+
+
+def run_benchmarks(counts=COUNTS, stages=tuple(STAGES), repeat=REPEAT,
+                   stream=sys.stdout):
+	# {stage: {count: result}}; skipped stages are left out
+	openmc_ok = have_openmc()
+	results = {}
+	for name in stages:
+		if STAGES[name][2] and not openmc_ok:
+			print("{:14s} skipped: OpenMC is not installed".format(name), file=stream)
+			continue
+		results[name] = {}
+		for count in counts:
+			result = time_stage(name, count, repeat)
+			results[name][str(count)] = result
+			print("{:14s} {:5d} designs: {:9.4f} s median, {:9.4f} s min "
+			      "({:.2e} s each), peak {:.1f} MB".format(
+				name, count, result["seconds"], result["min_seconds"],
+				result["per_design"], result["peak_mb"]), file=stream, flush=True)
+	return results
+
+
+def commit_id():
+	# Of the code being timed, wherever this is run from
+	repo = os.path.dirname(os.path.abspath(__file__))
+	try:
+		commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo,
+		                        capture_output=True, text=True, check=True)
+		dirty = subprocess.run(["git", "status", "--porcelain", "-uno"], cwd=repo,
+		                       capture_output=True, text=True, check=True)
+	except (OSError, subprocess.CalledProcessError):
+		return "unknown"
+	return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def save_results(results, folder=RESULTS_DIR):
+	commit = commit_id()
+	os.makedirs(folder, exist_ok=True)
+	path = os.path.join(folder, commit + ".json")
+	record = {"commit": commit, "time": time.time(),
+	          "python": platform.python_version(), "numpy": np.__version__,
+	          "machine": platform.machine(), "results": results}
+	with open(path, "w") as f:
+		json.dump(record, f, indent=1)
+	return path
+
+
+def compare(results, reference, stream=sys.stdout):
+	# Time ratios, this run over `reference`; > 1 is slower
+	ratios = {}
+	for name, by_count in results.items():
+		for count, result in by_count.items():
+			old = reference.get(name, {}).get(count)
+			if old is None:
+				continue
+			ratio = result["seconds"]/old["seconds"]
+			ratios[name, count] = ratio
+			print("{:14s} {:>5s} designs: x{:.2f} time, {:+.1f} MB peak".format(
+				name, count, ratio, result["peak_mb"] - old["peak_mb"]), file=stream)
+	return ratios
+
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Time the hot paths.")
+	parser.add_argument("--counts", type=int, nargs="+", default=COUNTS)
+	parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+	parser.add_argument("--repeat", type=int, default=REPEAT,
+	                    help="timed runs per stage and count")
+	parser.add_argument("--compare", metavar="COMMIT",
+	                    help="commit whose saved results to compare against")
+	parser.add_argument("--no-save", action="store_true")
+	args = parser.parse_args()
+	reference = None
+	if args.compare:
+		with open(os.path.join(RESULTS_DIR, args.compare + ".json")) as f:
+			reference = json.load(f)["results"]
+	results = run_benchmarks(args.counts, args.stages, args.repeat)
+	if not args.no_save:
+		print("Saved to", save_results(results))
+	if reference is not None:
+		compare(results, reference)
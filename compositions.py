@@ -0,0 +1,117 @@
+# Nuclide number densities of the fuel and moderator families
+#
+# The fuel is U-Mo metal with U at a given enrichment (wt% U-235) and a Mo
+# weight fraction; the moderator is light water at a given density. Each
+# element is expanded into nuclide weight fractions once (for U, once per
+# enrichment), and whole grids of compositions are then one NumPy product:
+# number densities come out as (..., nuclide) arrays in atoms/b-cm, in the
+# order of FUEL_NUCLIDES or WATER_NUCLIDES.
+#
+# Uranium follows OpenMC's add_element(enrichment=...): U-234 and U-236
+# take 0.0089 and 0.0046 of the U-235 weight percent, and U-238 the rest.
+
+import functools
+import numpy as np
+from collections import namedtuple
+
+AVOGADRO = 0.6022140857  # atoms-cm^2/(mol-barn)
+
+ATOMIC_MASS = {
+	"H1": 1.00782503, "H2": 2.01410178, "O16": 15.99491462,
+	"Mo92": 91.906811, "Mo94": 93.9050883, "Mo95": 94.9058421,
+	"Mo96": 95.9046795, "Mo97": 96.9060215, "Mo98": 97.9054082,
+	"Mo100": 99.907477,
+	"U234": 234.0409521, "U235": 235.0439299, "U236": 236.045568,
+	"U238": 238.0507882,
+}
+# Natural abundances, atom fractions
+NATURAL = {
+	"H": {"H1": 0.99985, "H2": 0.00015},
+	"Mo": {"Mo92": 0.1453, "Mo94": 0.0915, "Mo95": 0.1584, "Mo96": 0.1667,
+	       "Mo97": 0.0960, "Mo98": 0.2439, "Mo100": 0.0982},
+}
+
+FUEL_NUCLIDES = ("U234", "U235", "U236", "U238") + tuple(NATURAL["Mo"])
+WATER_NUCLIDES = ("H1", "H2", "O16")
+
+# The fuel and moderator in materials.py
+ENRICHMENT = 19.99
+MO_FRACTION = 0.1
+FUEL_DENSITY = 19.0
+WATER_DENSITY = 0.49
+
+# Key of one fuel: enrichment (wt% U-235), Mo weight fraction, density (g/cc)
+Fuel = namedtuple("Fuel", ("enrichment", "mo_fraction", "density"))
+Fuel.__new__.__defaults__ = (ENRICHMENT, MO_FRACTION, FUEL_DENSITY)
+
+
+@functools.lru_cache(maxsize=None)
+def expand_element(element):
+	# (nuclides, weight fractions) of a natural element
+	nuclides = tuple(NATURAL[element])
+	atoms = np.array([NATURAL[element][n] for n in nuclides])
+	mass = atoms*np.array([ATOMIC_MASS[n] for n in nuclides])
+	return nuclides, mass/mass.sum()
+
+
+def uranium_weights(enrichment):
+	# (..., 4) weight fractions of U234, U235, U236, U238
+	e = np.asarray(enrichment, dtype=float)/100
+	return np.stack([0.0089*e, e, 0.0046*e, 1 - 1.0135*e], axis=-1)
+
+
+def _densities(weights, nuclides, density):
+	# Weight fractions (..., nuclide) to atoms/b-cm
+	masses = np.array([ATOMIC_MASS[n] for n in nuclides])
+	return np.asarray(density, dtype=float)[..., None]*AVOGADRO*weights/masses
+
+
+def fuel_densities(enrichment=ENRICHMENT, mo_fraction=MO_FRACTION,
+                   density=FUEL_DENSITY):
+	# (..., len(FUEL_NUCLIDES)) number densities, broadcast over the arguments
+	enrichment, mo_fraction, density = np.broadcast_arrays(
+		np.asarray(enrichment, dtype=float), np.asarray(mo_fraction, dtype=float),
+		np.asarray(density, dtype=float))
+	_, mo = expand_element("Mo")
+	weights = np.concatenate([(1 - mo_fraction)[..., None]*uranium_weights(enrichment),
+	                          mo_fraction[..., None]*mo], axis=-1)
+	return _densities(weights, FUEL_NUCLIDES, density)
+
+
+def water_densities(density=WATER_DENSITY):
+	# (..., len(WATER_NUCLIDES)) number densities of H2O
+	nuclides, h = expand_element("H")
+	h_mass = (h/np.array([ATOMIC_MASS[n] for n in nuclides])).sum()**-1
+	molecule = 2*h_mass + ATOMIC_MASS["O16"]
+	weights = np.append(2*h_mass/molecule*h, ATOMIC_MASS["O16"]/molecule)
+	return _densities(np.broadcast_to(weights, np.shape(density) + (3,)),
+	                  WATER_NUCLIDES, density)
+
+
+@functools.lru_cache(maxsize=None)
+def fuel_composition(enrichment=ENRICHMENT, mo_fraction=MO_FRACTION,
+                     density=FUEL_DENSITY):
+	# {nuclide: atoms/b-cm} of one fuel, cached
+	return dict(zip(FUEL_NUCLIDES, fuel_densities(enrichment, mo_fraction,
+	                                              density).tolist()))
+
+
+@functools.lru_cache(maxsize=None)
+def water_composition(density=WATER_DENSITY):
+	return dict(zip(WATER_NUCLIDES, water_densities(density).tolist()))
+
+
+def fuel_grid(enrichments, mo_fractions, densities=(FUEL_DENSITY,)):
+	# Number densities over the grid, shape (enrichment, Mo, density, nuclide)
+	return fuel_densities(np.asarray(enrichments, dtype=float)[:, None, None],
+	                      np.asarray(mo_fractions, dtype=float)[None, :, None],
+	                      np.asarray(densities, dtype=float)[None, None, :])
+
+
+if __name__ == "__main__":
+	enrichments = np.linspace(5, 19.99, 4)
+	mo_fractions = (0.07, 0.1)
+	grid = fuel_grid(enrichments, mo_fractions)
+	u235 = FUEL_NUCLIDES.index("U235")
+	for e, row in zip(enrichments, grid[..., 0, u235]):
+		print("{:5.2f}%".format(e), "  ".join("{:.4e}".format(n) for n in row))
@@ -10,8 +10,11 @@ CLAD_RATIOS = {"Zr4"  : 1.07,
                "SS316": 1.05}
 CLAD_YIELDS = {"Zr4"  : 160,
                "SS316": 205}
+CLAD_DENSITIES = {"Zr4"  : 6.55,  # g/cc
+                  "SS316": 8.0}
 
-DR = 1.3**(1/3)
+FUEL_EXPANSION = 1.3  # 30% growth by volume
+DR = FUEL_EXPANSION**(1/3)
 
 # dimensions in cm
 WIDTH = 240
@@ -0,0 +1,142 @@
+# Control-worth batch mode
+#
+# Builds a slice once and writes one deck per rod configuration: which of
+# the guide tube positions hold a control rod. A configuration only swaps
+# universes in the guide tube positions of the model's lattices. Both guide
+# tube universes, with and without the rod, are the usual shared ones from
+# pincell; the lattices are the only objects that change, so every ID, and
+# with it every other file of the deck, stays the same.
+#
+# Each configuration goes in a subfolder of the case folder, rods_<name>/
+# with its own geometry.xml and links to the case's other files, its warm
+# start source included. In 3D, the configuration applies to every axial
+# zone.
+#
+# IDs depend on what a process has built before, so the case's own deck is
+# always rewritten from this build, and a configuration is current only
+# while the case's geometry.xml is byte for byte the one it was made from.
+
+import os
+import shutil
+import hashlib
+from pincell import GuideTube
+import layout
+import profiling
+from deck_cache import Manifest, digest, VARIANT_PREFIX
+
+
+def _link(src, dst):
+	if os.path.lexists(dst):
+		os.remove(dst)
+	try:
+		os.symlink(os.path.relpath(src, os.path.dirname(dst)), dst)
+	except OSError:
+		shutil.copy2(src, dst)
+
+
+def rod_banks(n, pattern):
+	# Guide tube positions grouped by their ring around the core center,
+	# innermost first
+	banks = {}
+	for q, r in layout.guide_tube_positions(n, pattern):
+		k = layout.hex_distance(*layout.to_core(q, r, n))
+		banks.setdefault(k, []).append((q, r))
+	return [banks[k] for k in sorted(banks)]
+
+
+class ControlWorth:
+	def __init__(self, model):
+		self.model = model
+		self.n = layout.num_rings(model.pitch)
+		self.positions = layout.guide_tube_positions(self.n, model.guide_tubes)
+		self.written = model.export_to_xml(force=True)
+		self.base_keys = model._cache_keys()
+		# A warm start's settings.xml reads its source from the case folder
+		source = model.source_file
+		if source and not os.path.isabs(source):
+			entries = Manifest(model.folder_name).entries
+			self.base_keys[source] = entries.get(source, digest(source))
+		with open(os.path.join(model.folder_name, "geometry.xml"), "rb") as f:
+			self._base_geometry = hashlib.sha256(f.read()).hexdigest()
+		# Per lattice: its rings as built and the guide tube universes for
+		# its pincell
+		self._lattices = []
+		for hlat, pincell in model._lattices:
+			tubes = {rod: GuideTube(pincell, rod).build() for rod in (False, True)}
+			rings = [list(ring) for ring in hlat.universes[0]]
+			self._lattices.append((hlat, rings, tubes))
+		self._index = {pos: layout.axial_to_index(*pos, self.n)
+		               for pos in self.positions}
+	
+	def rod_banks(self):
+		return rod_banks(self.n, self.model.guide_tubes)
+	
+	def folder_name(self, name):
+		return os.path.join(self.model.folder_name, VARIANT_PREFIX + name, "")
+	
+	def set_rods(self, rodded):
+		# Fill the guide tubes at the (q, r) in `rodded` with rods, and empty
+		# the rest. restore() puts the model's own lattices back.
+		rodded = set(rodded)
+		unknown = rodded - set(self.positions)
+		if unknown:
+			raise ValueError("Not guide tube positions: {}".format(
+				sorted(unknown)))
+		for hlat, rings, tubes in self._lattices:
+			rings = [list(ring) for ring in rings]
+			for pos, (ring, i) in self._index.items():
+				rings[ring][i] = tubes[pos in rodded]
+			hlat.universes = [rings]
+	
+	def restore(self):
+		for hlat, rings, _ in self._lattices:
+			hlat.universes = [[list(ring) for ring in rings]]
+	
+	def export_variant(self, rodded, name=None, force=False):
+		"""Write the deck with rods at `rodded`; returns its folder
+	
+		Only geometry.xml is written, and only if the configuration or the
+		case changed since the last export. The other files link to the
+		case's own.
+		"""
+		rodded = sorted(set(rodded))
+		if name is None:
+			name = digest(rodded)[:8]
+		folder = self.folder_name(name)
+		os.makedirs(folder, exist_ok=True)
+		manifest = Manifest(folder)
+		keys = dict(self.base_keys)
+		keys["geometry.xml"] = digest(self._base_geometry, rodded)
+		if force or not manifest.is_current("geometry.xml", keys["geometry.xml"]):
+			self.set_rods(rodded)
+			try:
+				with profiling.stage("export geometry.xml"):
+					self.model._geometry.export_to_xml(folder + "geometry.xml")
+			finally:
+				self.restore()
+			manifest.update("geometry.xml", keys["geometry.xml"])
+		for fname, key in keys.items():
+			if fname == "geometry.xml":
+				continue
+			_link(os.path.join(self.model.folder_name, fname), folder + fname)
+			manifest.entries[fname] = key
+		manifest.save()
+		return folder
+	
+	def export_bank_curve(self, banks=None, force=False):
+		# Decks with 0, 1, 2, ... banks inserted, in order; returns the folders
+		banks = self.rod_banks() if banks is None else banks
+		folders = []
+		inserted = []
+		for k in range(len(banks) + 1):
+			folders.append(self.export_variant(inserted, "banks{}".format(k), force))
+			if k < len(banks):
+				inserted = inserted + list(banks[k])
+		return folders
+
+
+if __name__ == "__main__":
+	from slice3d import Slice3D
+	worth = ControlWorth(Slice3D(2.25, 9.8, "SS316"))
+	for folder in worth.export_bank_curve():
+		print("Exported to:", folder)
@@ -0,0 +1,101 @@
+# Content-addressed export cache
+#
+# Each case folder keeps a manifest of the input digest behind every file
+# in it, so an export only regenerates the files whose inputs changed.
+
+import os
+import re
+import sys
+import json
+import hashlib
+import constants
+
+MANIFEST = "manifest.json"
+# Subfolders of a case folder with control-worth configurations of its deck
+VARIANT_PREFIX = "rods_"
+
+
+def case_folder(clad_type, radius, pitch, tag=None):
+	folder = "{}/radius{:.2f}_pitch{:.2f}".format(clad_type, radius, pitch)
+	if tag:
+		folder += "_" + tag
+	return folder + "/"
+
+
+_CASE_FOLDER = re.compile(r"(?P<clad_type>[^/\\]+)[/\\]radius(?P<radius>[0-9.]+)"
+                          r"_pitch(?P<pitch>[0-9.]+)(?:_(?P<tag>\w+))?[/\\]?$")
+
+
+def parse_case_folder(folder):
+	# Inverse of case_folder; None if `folder` does not end in a case folder
+	match = _CASE_FOLDER.search(folder)
+	if match is None:
+		return None
+	return dict(clad_type=match["clad_type"],
+	            radius=float(match["radius"]),
+	            pitch=float(match["pitch"]),
+	            tag=match["tag"])
+
+
+def digest(*parts):
+	text = json.dumps(parts, sort_keys=True, default=repr)
+	return hashlib.sha256(text.encode()).hexdigest()
+
+
+def case_tag(fuel=None, zones=(), rodded=False):
+	# Folder tag of a rodded case, or one with a non-default fuel or axial
+	# zones; None if none of them
+	parts = ["rodded"] if rodded else []
+	if fuel is not None:
+		parts.append("fuel" + digest(tuple(fuel))[:8])
+	if zones:
+		parts.append("zones" + digest(tuple(zones))[:8])
+	return "_".join(parts) or None
+
+
+def constants_state():
+	return {k: v for k, v in vars(constants).items() if k.isupper()}
+
+
+def materials_state(matdict):
+	# The repr holds the ID, density and every nuclide
+	return {key: repr(mat) for key, mat in matdict.items()}
+
+
+def colors_state(colormap):
+	return sorted((mat.id, color) for mat, color in colormap.items())
+
+
+def source_state(*module_names):
+	# The code that builds a deck is an input to it too. Keyed by file name,
+	# so a module run as a script ("__main__") keys the same as imported.
+	state = {}
+	for name in module_names:
+		path = sys.modules[name].__file__
+		with open(path, "rb") as f:
+			state[os.path.basename(path)] = hashlib.sha256(f.read()).hexdigest()
+	return state
+
+
+class Manifest:
+	def __init__(self, folder):
+		self.folder = folder
+		self.path = os.path.join(folder, MANIFEST)
+		self.entries = {}
+		if os.path.isfile(self.path):
+			with open(self.path) as f:
+				self.entries = json.load(f)
+	
+	def is_current(self, fname, key):
+		return (self.entries.get(fname) == key and
+		        os.path.exists(os.path.join(self.folder, fname)))
+	
+	def update(self, fname, key):
+		self.entries[fname] = key
+		self.save()
+	
+	def save(self):
+		tmp = self.path + ".tmp"
+		with open(tmp, "w") as f:
+			json.dump(self.entries, f, indent=1, sort_keys=True)
+		os.replace(tmp, self.path)
@@ -0,0 +1,110 @@
+# Parametric deck generator
+#
+# Builds and exports one Slice2D/Slice3D deck per case, one case per worker
+# process, into the usual {clad_type}/radius..._pitch.../ folders.
+
+import sys
+import itertools
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from constants import CLADS
+from deck_cache import case_folder, case_tag
+import run_control as rc
+import warm_start
+
+# fuel: compositions.Fuel, or None for the default fuel
+Case = namedtuple("Case", ("radius", "pitch", "clad_type", "rodded", "fuel"))
+Case.__new__.__defaults__ = (False, None)
+
+
+def make_grid(radii, pitches, clads=CLADS, rodded=(False,), fuels=(None,)):
+	return [Case(*c)
+	        for c in itertools.product(radii, pitches, clads, rodded, fuels)]
+
+
+def get_model(dim):
+	if dim == 2:
+		from slice2d import Slice2D
+		return Slice2D
+	elif dim == 3:
+		from slice3d import Slice3D
+		return Slice3D
+	raise ValueError("dim must be 2 or 3, not {}".format(dim))
+
+
+def folder_name(case):
+	return case_folder(case.clad_type, case.radius, case.pitch,
+	                   case_tag(case.fuel, rodded=case.rodded))
+
+
+def export_case(case, dim=3, force=False, run_control=None, warm=False):
+	# Only builds the geometry if a file that needs it is stale
+	# warm: start a new case from the sites of the nearest finished case, if
+	# there is one (see warm_start.prepare)
+	model = get_model(dim)(case.radius, case.pitch, case.clad_type,
+	                       rodded=case.rodded, fuel=case.fuel,
+	                       run_control=run_control)
+	if warm:
+		prepared = warm_start.prepare(model)
+		if prepared is not None:
+			model.source_file = prepared[0]
+			model.run_control = model.run_control._replace(
+				inactive=warm_start.WARM_INACTIVE)
+	written = model.export_to_xml(force=force)
+	return model.folder_name, written
+
+
+def _export_case_safe(case, dim, force, run_control, warm):
+	# Exceptions from OpenMC don't always pickle; send back the traceback text
+	try:
+		return export_case(case, dim, force, run_control, warm), None
+	except Exception:
+		return None, traceback.format_exc()
+
+
+def run_sweep(cases, dim=3, max_workers=None, force=False, run_control=None,
+              warm=False, stream=sys.stdout):
+	# run_control: the same for every case; by default, the particles per
+	# batch are picked from the number of cases
+	cases = [Case(*c) for c in cases]
+	run_control = run_control or rc.for_sweep(len(cases))
+	folders = [folder_name(c) for c in cases]
+	duplicates = {f for f in folders if folders.count(f) > 1}
+	if duplicates:
+		raise ValueError("Cases would overwrite each other in: " +
+		                 ", ".join(sorted(duplicates)))
+	done = {}
+	failed = {}
+	n = len(cases)
+	with ProcessPoolExecutor(max_workers=max_workers) as pool:
+		futures = {pool.submit(_export_case_safe, case, dim, force,
+		                       run_control, warm): case
+		           for case in cases}
+		for i, future in enumerate(as_completed(futures), 1):
+			case = futures[future]
+			try:
+				result, error = future.result()
+			except Exception:
+				# The worker itself died
+				result, error = None, traceback.format_exc()
+			if error is None:
+				folder, written = result
+				done[case] = folder
+				status = "ok" if written else "up to date"
+			else:
+				failed[case] = error
+				status = "FAILED"
+			print("[{}/{}] {} {}".format(i, n, folder_name(case), status),
+			      file=stream, flush=True)
+	for case, error in failed.items():
+		print("\n{}:\n{}".format(folder_name(case), error), file=stream)
+	print("{} exported, {} failed".format(len(done), len(failed)), file=stream)
+	return done, failed
+
+
+if __name__ == "__main__":
+	grid = make_grid(radii=[1.75, 2.0, 2.25, 2.5],
+	                 pitches=[8.0, 9.0, 9.8, 11.0],
+	                 clads=CLADS)
+	run_sweep(grid, dim=3)
@@ -0,0 +1,30 @@
+# Stand-in for the openmc executable, for trying out the scheduler
+#
+# Run in a case folder like openmc. Writes an empty statepoint named for the
+# last batch in settings.xml, after sleeping FAKE_OPENMC_SECONDS (default 0).
+#
+# usage: python fake_openmc.py [--threads N]
+
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+
+def last_batch(settings="settings.xml"):
+	root = ET.parse(settings).getroot()
+	for tag in ("trigger/max_batches", "batches"):
+		node = root.find(tag)
+		if node is not None:
+			return int(node.text)
+	return 1
+
+
+if __name__ == "__main__":
+	if not os.path.isfile("settings.xml"):
+		sys.exit("fake_openmc: no settings.xml in " + os.getcwd())
+	time.sleep(float(os.environ.get("FAKE_OPENMC_SECONDS", 0)))
+	fname = "statepoint.{}.h5".format(last_batch())
+	open(fname, "wb").close()
+	print("fake_openmc: wrote", fname, "with", os.environ.get("OMP_NUM_THREADS"),
+	      "thread(s)")
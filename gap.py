@@ -0,0 +1,61 @@
+# Gap sizing
+#
+# The fill gas is compressed from vgap(Rgap, Rfuel) to vgap(Rgap, DR*Rfuel)
+# as the fuel swells, so p0*(Rgap^2 - Rfuel^2) = p1*(Rgap^2 - (DR*Rfuel)^2),
+# which is quadratic in Rgap.
+
+import numpy as np
+from constants import PI, DR
+
+RTOL = 1E-8
+
+
+def vgap(Rgap, Rfuel):
+	return PI*(Rgap**2 - Rfuel**2)
+
+
+def residual(rgap, rfuel, p_fill, p_swollen, dr=DR):
+	vg0 = vgap(rgap, rfuel)
+	vg1 = vgap(rgap, dr*rfuel)
+	return vg0/vg1 - p_swollen/p_fill
+
+
+def rgap_closed_form(rfuel, p_fill, p_swollen, dr=DR):
+	k = np.asarray(p_swollen, dtype=float)/p_fill
+	with np.errstate(divide="ignore", invalid="ignore"):
+		return rfuel*np.sqrt((k*dr**2 - 1)/(k - 1))
+
+
+def _rgap_fsolve(rfuel, p_fill, p_swollen, dr):
+	from scipy.optimize import fsolve
+	return fsolve(lambda rg: residual(rg, rfuel, p_fill, p_swollen, dr),
+	              1.1*rfuel)[0]
+
+
+def solve_rgap(rfuel, p_fill, p_swollen, dr=DR, strict=True):
+	# With strict=False, designs that have no gap radius come back as nan
+	args = np.broadcast_arrays(*(np.asarray(a, dtype=float)
+	                             for a in (rfuel, p_fill, p_swollen, dr)))
+	shape = args[0].shape
+	rfuel, p_fill, p_swollen, dr = (a.ravel() for a in args)
+	rgap = rgap_closed_form(rfuel, p_fill, p_swollen, dr)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		ok = abs(residual(rgap, rfuel, p_fill, p_swollen, dr)) <= RTOL
+	ok &= rgap > dr*rfuel
+	# Fall back on fsolve only where the closed form fails, and check it.
+	# The gas has to be compressed (p_swollen > p_fill) for a root to exist.
+	for i in np.flatnonzero(~ok):
+		rg = np.nan
+		if p_swollen[i] > p_fill[i]:
+			rg = _rgap_fsolve(rfuel[i], p_fill[i], p_swollen[i], dr[i])
+		if not (rg > dr[i]*rfuel[i] and abs(
+				residual(rg, rfuel[i], p_fill[i], p_swollen[i], dr[i])) <= RTOL):
+			if strict:
+				raise ValueError(
+					"No gap radius for Rfuel={}, p_fill={}, p_swollen={}".format(
+						rfuel[i], p_fill[i], p_swollen[i]))
+			rg = np.nan
+		rgap[i] = rg
+	if not shape:
+		return float(rgap[0])
+	return rgap.reshape(shape)
@@ -0,0 +1,136 @@
+# Hexagonal lattice layout
+#
+# Lattice positions are handled in axial coordinates (q, r), in units of
+# the pitch, for the 'y' orientation used by openmc.HexLattice:
+#     x = q*sqrt(3)/2,    y = r + q/2
+# Ring k (k steps out from the lattice center) holds the points with
+# max(|q|, |r|, |q + r|) == k. OpenMC lists the rings outermost first,
+# each one clockwise starting from the top.
+#
+# The slices put the lattice corner (top of the outermost ring) on the core
+# center, so positions relative to the core are (q, s) with s = r - (n - 1).
+
+import math
+import numpy as np
+from collections import namedtuple
+from constants import RAD_MAJ, STEEL_THICK
+
+# Guide tubes every `spacing` pins on a triangular sub-lattice centered on
+# the core, placed only inside 1/`sector` of it (12: the slices' wedge
+# between x = 0 and the reflective edge at 30 degrees from it)
+GuideTubePattern = namedtuple("GuideTubePattern", ("spacing", "sector"))
+
+# Ring corners, clockwise from the top, as multiples of k
+_CORNERS = ((0, 1), (1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1))
+
+
+def ring_size(k):
+	return 6*k if k else 1
+
+
+def hex_distance(q, r):
+	return max(abs(q), abs(r), abs(q + r))
+
+
+def num_rings(pitch, extent=RAD_MAJ - STEEL_THICK):
+	# Enough rings for the lattice to cover the whole slice, which reaches
+	# `extent` from the core center, plus one for pins on the boundary
+	return math.ceil(extent/(2*pitch)) + 2
+
+
+def index_to_axial(ring, pos, n):
+	k = n - 1 - ring
+	if k == 0:
+		return 0, 0
+	side, j = divmod(pos, k)
+	q0, r0 = _CORNERS[side]
+	q1, r1 = _CORNERS[(side + 1) % 6]
+	return k*q0 + j*(q1 - q0), k*r0 + j*(r1 - r0)
+
+
+def axial_to_index(q, r, n):
+	k = hex_distance(q, r)
+	if k > n - 1:
+		raise IndexError("({}, {}) is outside a {}-ring lattice".format(q, r, n))
+	if k == 0:
+		return n - 1, 0
+	if r == k and q < 0:
+		side, j = 5, q + k
+	elif q >= 0 and r > 0:
+		side, j = 0, q
+	elif q == k:
+		side, j = 1, -r
+	elif r == -k:
+		side, j = 2, k - q
+	elif q + r == -k:
+		side, j = 3, -q
+	else:
+		side, j = 4, r
+	return n - 1 - k, side*k + j
+
+
+def axial_to_point(q, r, pitch, n):
+	# Pin center in the slice's (x, y), lattice center at (0, -(n - 1)*pitch)
+	return q*pitch*math.sqrt(3)/2, (r + q/2 - (n - 1))*pitch
+
+
+def point_to_axial(x, y, pitch, n):
+	# Axial (q, r) of the lattice cell holding each point, by cube rounding
+	qf = np.asarray(x)/pitch/(math.sqrt(3)/2)
+	rf = np.asarray(y)/pitch + (n - 1) - qf/2
+	sf = -qf - rf
+	q = np.rint(qf)
+	r = np.rint(rf)
+	s = np.rint(sf)
+	dq = abs(q - qf)
+	dr = abs(r - rf)
+	ds = abs(s - sf)
+	fix_q = (dq > dr) & (dq > ds)
+	fix_r = ~fix_q & (dr > ds)
+	q = np.where(fix_q, -r - s, q)
+	r = np.where(fix_r, -q - s, r)
+	return q.astype(int), r.astype(int)
+
+
+def to_core(q, r, n):
+	return q, r - (n - 1)
+
+
+def from_core(q, s, n):
+	return q, s + (n - 1)
+
+
+def in_sector(q, s, sector):
+	# (q, s) relative to the core center; pins on the reflective planes count
+	if sector == 1:
+		return True
+	elif sector == 12:
+		# Between x = 0 and the reflective edge y = -sqrt(3)*x
+		return q >= 0 and s + 2*q <= 0
+	raise ValueError("Unsupported symmetry sector: 1/{}".format(sector))
+
+
+def guide_tube_positions(n, pattern):
+	# `pattern` is a GuideTubePattern or explicit core-relative (q, s)
+	# positions; those outside an n-ring lattice are dropped
+	if not isinstance(pattern, GuideTubePattern):
+		positions = [from_core(q, s, n) for q, s in pattern]
+		return [(q, r) for q, r in positions if hex_distance(q, r) <= n - 1]
+	positions = []
+	for q in range(-(n - 1), n):
+		if q % pattern.spacing:
+			continue
+		for r in range(max(-(n - 1), -(n - 1) - q), min(n - 1, n - 1 - q) + 1):
+			qc, s = to_core(q, r, n)
+			if s % pattern.spacing == 0 and in_sector(qc, s, pattern.sector):
+				positions.append((q, r))
+	return positions
+
+
+def make_universes(n, fill, special=None):
+	# Rings for HexLattice.universes, with `special` mapping (q, r) -> universe
+	rings = [[fill]*ring_size(n - 1 - i) for i in range(n)]
+	for (q, r), universe in (special or {}).items():
+		ring, pos = axial_to_index(q, r, n)
+		rings[ring][pos] = universe
+	return rings
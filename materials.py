@@ -1,60 +1,138 @@
-import openmc
-
-
-all_materials = {}
-colormap = {}
-# Moderator at 10 MPa, 600 K
-water = openmc.Material(name="Water @ 10 MPa")
-#water.add_nuclide("H2", 2/3)#
-water.add_element("H", 2/3)
-water.add_nuclide("O16", 1/3)
-#water.add_element("B", 1.6E-3)
-water.set_density(density=0.49, units="g/cc")
-all_materials["Mod"] = water
-# Uranium metal (10% Moly by weight)
-m2 = openmc.Material(name="Uranium Moly10")
-m2.add_element("U", 0.9, enrichment=19.99, percent_type='wo')
-m2.add_element("Mo", 0.1, percent_type='wo')
-m2.set_density("g/cc", 19.0)
-all_materials["Fuel"] = m2
-# Zirc 4 copied from BEAVRS
-zr4 = openmc.Material(name="Zircaloy-4")
-zr4.set_density('g/cc', 6.55)
-zr4.add_nuclide('O16', 0.00125, 'wo')
-zr4.add_element('Cr', 0.0010, 'wo')
-zr4.add_element('Fe', 0.0021, 'wo')
-zr4.add_element('Zr', 0.98115, 'wo')
-zr4.add_element('Sn', 0.0145, 'wo')
-colormap[zr4] = "gray"
-all_materials["Zr4"] = zr4
-# SS316 - Atlas Steels (worldstainless.com)
-ss = openmc.Material(name="Stainless Steel 316")
-ss.set_density("g/cc", 8.0)
-ss.add_element("Cr", 17, 'wo')
-ss.add_element("Mo", 2, 'wo')
-ss.add_element("Ni", 12, 'wo')
-ss.add_element("Fe", 69, 'wo')
-colormap[ss] = "darkgray"
-all_materials["SS316"] = ss
-# Plain old air
-air = openmc.Material(name="air")
-air.set_density("g/cc", 0.001)
-air.add_nuclide("O16", 0.232, 'wo')
-air.add_nuclide("N14", 0.755, 'wo')
-air.add_nuclide("Ar40",0.013, 'wo')
-colormap[air] = "tan"
-all_materials["Air"] = air
-# Copper
-copper = openmc.Material(name="copper")
-copper.add_element("Cu", 1)
-copper.set_density("g/cc", 9)
-colormap[copper] = "orange"
-all_materials["Copper"] = copper
-# Boron carbide
-boron_carbide = openmc.Material(name="B4C")
-boron_carbide.add_nuclide("C0", 0.2)
-boron_carbide.add_element("B", 0.8)
-boron_carbide.set_density("g/cc", 1.8)
-colormap[boron_carbide] = "black"
-all_materials["B4C"] = boron_carbide
+# Materials are only created the first time something reads all_materials
+# or colormap, so importing this module does not import OpenMC.
+from collections.abc import MutableMapping
+from constants import CLAD_DENSITIES
+import compositions
 
+
+class _Registry(MutableMapping):
+	def __init__(self):
+		self._data = None
+	
+	@property
+	def data(self):
+		if self._data is None:
+			_load()
+		return self._data
+	
+	def __getitem__(self, key):
+		return self.data[key]
+	
+	def __setitem__(self, key, value):
+		self.data[key] = value
+	
+	def __delitem__(self, key):
+		del self.data[key]
+	
+	def __iter__(self):
+		return iter(self.data)
+	
+	def __len__(self):
+		return len(self.data)
+	
+	def __repr__(self):
+		return repr(self.data)
+
+
+all_materials = _Registry()
+colormap = _Registry()
+
+
+def _load():
+	import openmc
+	mats = {}
+	colors = {}
+	# Moderator at 10 MPa, 600 K
+	water = openmc.Material(name="Water @ 10 MPa")
+	#water.add_nuclide("H2", 2/3)#
+	water.add_element("H", 2/3)
+	water.add_nuclide("O16", 1/3)
+	#water.add_element("B", 1.6E-3)
+	water.set_density(density=compositions.WATER_DENSITY, units="g/cc")
+	mats["Mod"] = water
+	# Uranium metal (10% Moly by weight, 19.99% enriched)
+	mats["Fuel"] = _fuel_material(compositions.Fuel(), "Uranium Moly10")
+	# Zirc 4 copied from BEAVRS
+	zr4 = openmc.Material(name="Zircaloy-4")
+	zr4.set_density("g/cc", CLAD_DENSITIES["Zr4"])
+	zr4.add_nuclide('O16', 0.00125, 'wo')
+	zr4.add_element('Cr', 0.0010, 'wo')
+	zr4.add_element('Fe', 0.0021, 'wo')
+	zr4.add_element('Zr', 0.98115, 'wo')
+	zr4.add_element('Sn', 0.0145, 'wo')
+	colors[zr4] = "gray"
+	mats["Zr4"] = zr4
+	# SS316 - Atlas Steels (worldstainless.com)
+	ss = openmc.Material(name="Stainless Steel 316")
+	ss.set_density("g/cc", CLAD_DENSITIES["SS316"])
+	ss.add_element("Cr", 17, 'wo')
+	ss.add_element("Mo", 2, 'wo')
+	ss.add_element("Ni", 12, 'wo')
+	ss.add_element("Fe", 69, 'wo')
+	colors[ss] = "darkgray"
+	mats["SS316"] = ss
+	# Plain old air
+	air = openmc.Material(name="air")
+	air.set_density("g/cc", 0.001)
+	air.add_nuclide("O16", 0.232, 'wo')
+	air.add_nuclide("N14", 0.755, 'wo')
+	air.add_nuclide("Ar40",0.013, 'wo')
+	colors[air] = "tan"
+	mats["Air"] = air
+	# Copper
+	copper = openmc.Material(name="copper")
+	copper.add_element("Cu", 1)
+	copper.set_density("g/cc", 9)
+	colors[copper] = "orange"
+	mats["Copper"] = copper
+	# Boron carbide
+	boron_carbide = openmc.Material(name="B4C")
+	boron_carbide.add_nuclide("C0", 0.2)
+	boron_carbide.add_element("B", 0.8)
+	boron_carbide.set_density("g/cc", 1.8)
+	colors[boron_carbide] = "black"
+	mats["B4C"] = boron_carbide
+	all_materials._data = mats
+	colormap._data = colors
+
+
+_moderators = {}
+
+
+def moderator(density):
+	# Water like all_materials["Mod"], at another density (g/cc)
+	if density == compositions.WATER_DENSITY:
+		return all_materials["Mod"]
+	if density not in _moderators:
+		mod = all_materials["Mod"].clone()
+		mod.name = "Water @ {} g/cc".format(density)
+		mod.set_density("g/cc", density)
+		_moderators[density] = mod
+	return _moderators[density]
+
+
+_fuels = {}
+
+
+def _fuel_material(key, name):
+	# From the cached number densities of compositions.py, so U and Mo are
+	# not expanded again for each fuel
+	import openmc
+	mat = openmc.Material(name=name)
+	densities = compositions.fuel_composition(*key)
+	for nuclide, n in densities.items():
+		mat.add_nuclide(nuclide, n, "ao")
+	mat.set_density("atom/b-cm", sum(densities.values()))
+	return mat
+
+
+def fuel(enrichment=compositions.ENRICHMENT, mo_fraction=compositions.MO_FRACTION,
+         density=compositions.FUEL_DENSITY):
+	# U-Mo like all_materials["Fuel"], at another composition
+	key = compositions.Fuel(enrichment, mo_fraction, density)
+	if key == compositions.Fuel():
+		return all_materials["Fuel"]
+	if key not in _fuels:
+		_fuels[key] = _fuel_material(key, "Uranium Moly{:g} @ {:g}%".format(
+			100*mo_fraction, enrichment))
+	return _fuels[key]
@@ -0,0 +1,127 @@
+# Constrained fuel pin design optimizer
+#
+# Searches fuel radius, fill pressure and clad thickness ratio, for every
+# clad type at once, for the pin with the least clad per unit of fuel. The
+# clad's max stress (Tresca/von Mises, from sweep.max_stress) must stay
+# below a fraction of its yield both at BOL and with the fuel swollen.
+#
+# Differential evolution (rand/1/bin), with one population per clad type.
+# Every generation is evaluated as one NumPy batch over (clad, population).
+# Candidates are ranked by feasibility first: a design within the stress
+# limit beats any design outside it, and of two designs outside it, the
+# one less over the limit wins.
+
+import numpy as np
+from collections import namedtuple
+from constants import CLADS, CLAD_YIELDS, CLAD_DENSITIES
+from rpv import SAFETY_FACTOR
+from sweep import max_stress
+from vessel_finder import P_OUT, P_IN0_MIN
+
+VARIABLES = ("r_fuel", "p_fill", "t_ratio")
+BOUNDS = ((1.0, 2.5), (P_IN0_MIN, 0.95*P_OUT), (0.01, 0.2))
+YIELD_FRACTION = 1/SAFETY_FACTOR
+POPULATION = 48
+GENERATIONS = 150
+MUTATION = 0.7
+CROSSOVER = 0.9
+
+Design = namedtuple("Design", ("clad_type", "r_fuel", "p_fill", "t_ratio",
+                               "r_gap", "thickness", "stress", "objective"))
+
+
+def clad_volume(r_fuel, r_gap, thickness, clad_type):
+	# Clad volume per unit of fuel volume
+	return ((r_gap + thickness)**2 - r_gap**2)/r_fuel**2
+
+
+def clad_mass(r_fuel, r_gap, thickness, clad_type):
+	# Clad mass (g) per cm^3 of fuel
+	density = np.array([CLAD_DENSITIES[c] for c in np.ravel(clad_type)])
+	density = density.reshape(np.shape(clad_type))
+	return density*clad_volume(r_fuel, r_gap, thickness, clad_type)
+
+
+OBJECTIVES = {"clad_volume": clad_volume, "clad_mass": clad_mass}
+
+
+def evaluate(r_fuel, p_fill, t_ratio, clad_type, objective="clad_volume",
+             yield_fraction=YIELD_FRACTION, p_out=P_OUT):
+	"""Objective, constraint violation and stress, broadcast over the arguments
+
+	The violation is how far, as a fraction, the max stress is over
+	yield_fraction of the clad's yield; 0 for a feasible design and inf
+	where there is no valid gap.
+	"""
+	clad_type = np.asarray(clad_type)
+	yields = np.array([CLAD_YIELDS[c] for c in clad_type.ravel()], dtype=float)
+	allowable = yield_fraction*yields.reshape(clad_type.shape)
+	stress, rg = max_stress(p_fill, r_fuel, t_ratio, p_out)
+	f = OBJECTIVES[objective](r_fuel, rg, t_ratio*rg, clad_type)
+	violation = np.maximum(stress/allowable - 1, 0)
+	violation = np.where(np.isfinite(violation), violation, np.inf)
+	return f, violation, stress
+
+
+def _better(f1, v1, f0, v0):
+	# Whether (f1, v1) ranks at least as well as (f0, v0)
+	feasible = (v1 == 0) & (v0 == 0)
+	return np.where(feasible, f1 <= f0, v1 <= v0)
+
+
+def optimize(objective="clad_volume", clads=CLADS, bounds=BOUNDS,
+             yield_fraction=YIELD_FRACTION, p_out=P_OUT,
+             population=POPULATION, generations=GENERATIONS, seed=None):
+	# Returns the best Design for each clad type, best first
+	rng = np.random.default_rng(seed)
+	lower, upper = np.array(bounds, dtype=float).T
+	nc = len(clads)
+	types = np.array(clads)[:, None]
+
+	def score(unit):
+		x = lower + unit*(upper - lower)
+		return evaluate(x[..., 0], x[..., 1], x[..., 2], types, objective,
+		                yield_fraction, p_out)
+
+	pop = rng.random((nc, population, len(VARIABLES)))
+	f, v, stress = score(pop)
+	rows = np.arange(population)
+	for _ in range(generations):
+		# Three distinct other members for each one, in every population
+		keys = rng.random((nc, population, population))
+		keys[:, rows, rows] = np.inf
+		a, b, c = np.moveaxis(np.argsort(keys, axis=-1)[..., :3], -1, 0)
+		take = np.arange(nc)[:, None]
+		mutant = pop[take, a] + MUTATION*(pop[take, b] - pop[take, c])
+		cross = rng.random(pop.shape) < CROSSOVER
+		# At least one variable always comes from the mutant
+		forced = rng.integers(len(VARIABLES), size=(nc, population))
+		cross[take, rows, forced] = True
+		trial = np.clip(np.where(cross, mutant, pop), 0, 1)
+		ft, vt, st = score(trial)
+		keep = _better(ft, vt, f, v)
+		pop = np.where(keep[..., None], trial, pop)
+		f = np.where(keep, ft, f)
+		v = np.where(keep, vt, v)
+		stress = np.where(keep, st, stress)
+
+	designs = []
+	for i, clad in enumerate(clads):
+		order = np.lexsort((f[i], v[i]))
+		j = order[0]
+		if v[i, j] > 0:
+			continue
+		r_fuel, p_fill, t_ratio = lower + pop[i, j]*(upper - lower)
+		_, rg = max_stress(p_fill, r_fuel, t_ratio, p_out)
+		designs.append(Design(clad, r_fuel, p_fill, t_ratio, float(rg),
+		                      float(t_ratio*rg), stress[i, j], f[i, j]))
+	return sorted(designs, key=lambda d: d.objective)
+
+
+if __name__ == "__main__":
+	for objective in OBJECTIVES:
+		print(objective)
+		for design in optimize(objective, seed=1):
+			print("\t{0.clad_type:5s} rfuel {0.r_fuel:.3f} cm, fill {0.p_fill:.2f} MPa,"
+			      " t/R {0.t_ratio:.4f}, stress {0.stress:.1f} MPa: {0.objective:.4f}"
+			      .format(design))
@@ -0,0 +1,166 @@
+# Spatial index of the pins in a slice's hex lattice
+#
+# Every lattice position is stored once, in OpenMC's (ring, position) order,
+# as flat NumPy arrays: flat index i <-> (ring, pos) <-> (q, r) <-> (x, y).
+# Point lookups are vectorized with cube rounding, so mapping any number of
+# points or tally bins to pins needs no Python loop per pin.
+#
+# Pin-aligned mesh: a hex lattice has no single rectangular mesh with one pin
+# per bin, because alternate columns are offset by half a pitch. Two regular
+# meshes with one column of bins per lattice column do, one with its rows
+# centered on the even columns and one on the odd columns. Each pin lies
+# wholly inside one bin of the mesh for its column, as long as the fuel fits
+# in a sqrt(3)/2*pitch wide bin.
+
+import math
+import numpy as np
+import layout
+
+PIN = 0
+GUIDE_TUBE = 1
+
+
+class PinIndex:
+	def __init__(self, pitch, n, gtubes=()):
+		# gtubes: (q, r) of the guide tubes
+		self.pitch = pitch
+		self.n = n
+		sizes = [layout.ring_size(n - 1 - ring) for ring in range(n)]
+		self.offsets = np.cumsum([0] + sizes)
+		self.ring = np.repeat(np.arange(n), sizes)
+		self.pos = np.arange(self.offsets[-1]) - self.offsets[self.ring]
+		qr = [layout.index_to_axial(ring, pos, n)
+		      for ring, pos in zip(self.ring, self.pos)]
+		self.q, self.r = np.array(qr).T
+		self.x, self.y = layout.axial_to_point(self.q, self.r, pitch, n)
+		# (q, r) -> flat index, with -1 outside the lattice
+		self._table = np.full((2*n - 1, 2*n - 1), -1, dtype=int)
+		self._table[self.q + n - 1, self.r + n - 1] = np.arange(self.size)
+		self.kind = np.full(self.q.shape, PIN, dtype=np.int8)
+		if len(gtubes):
+			self.kind[self.flat_index(*np.transpose(gtubes))] = GUIDE_TUBE
+		self._tree = {}
+	
+	@classmethod
+	def from_model(cls, model):
+		n = layout.num_rings(model.pitch)
+		gtubes = layout.guide_tube_positions(n, model.guide_tubes)
+		return cls(model.pitch, n, gtubes)
+	
+	@property
+	def size(self):
+		return len(self.ring)
+	
+	def flat_index(self, q, r):
+		# Vectorized; -1 where (q, r) is outside the lattice
+		q = np.asarray(q)
+		r = np.asarray(r)
+		n = self.n
+		inside = np.maximum(np.maximum(abs(q), abs(r)), abs(q + r)) <= n - 1
+		qq = np.where(inside, q + n - 1, 0)
+		rr = np.where(inside, r + n - 1, 0)
+		return np.where(inside, self._table[qq, rr], -1)
+	
+	def from_ring_pos(self, ring, pos):
+		return self.offsets[np.asarray(ring)] + np.asarray(pos)
+	
+	def ring_pos_to_xy(self, ring, pos):
+		i = self.from_ring_pos(ring, pos)
+		return self.x[i], self.y[i]
+	
+	def locate(self, x, y):
+		# Flat index of the lattice cell holding each point, -1 outside
+		q, r = layout.point_to_axial(x, y, self.pitch, self.n)
+		return self.flat_index(q, r)
+	
+	def xy_to_ring_pos(self, x, y):
+		i = self.locate(x, y)
+		inside = i >= 0
+		return np.where(inside, self.ring[i], -1), np.where(inside, self.pos[i], -1)
+	
+	def nearest(self, x, y, k=1, kind=PIN):
+		# (distance, flat index) of the k nearest positions of one kind, or of
+		# any kind with kind=None. Any-kind k=1 is the cell holding the point.
+		x = np.asarray(x, dtype=float)
+		y = np.asarray(y, dtype=float)
+		if kind is None and k == 1:
+			i = self.locate(x, y)
+			if np.all(i >= 0):
+				return np.hypot(x - self.x[i], y - self.y[i]), i
+		from scipy.spatial import cKDTree
+		if kind not in self._tree:
+			subset = np.arange(self.size)
+			if kind is not None:
+				subset = np.flatnonzero(self.kind == kind)
+			self._tree[kind] = (cKDTree(np.column_stack(
+				(self.x[subset], self.y[subset]))), subset)
+		tree, subset = self._tree[kind]
+		dist, j = tree.query(np.stack((x, y), axis=-1), k=k)
+		return dist, subset[j]
+	
+	def _mesh_bins(self):
+		# (whether each pin is in an even column, its x bin, its y bin in the
+		# mesh for its column)
+		n = self.n
+		ix = self.q + n - 1
+		even = self.q % 2 == 0
+		# Rows of the even (odd) mesh are centered on the even (odd) columns
+		iy = np.where(even, self.r + self.q//2 + n - 1,
+		              self.r + (self.q - 1)//2 + n)
+		return even, ix, iy
+	
+	def mesh_geometry(self):
+		# [(lower_left, upper_right, dimension)] of the even and odd meshes
+		n = self.n
+		dx = self.pitch*math.sqrt(3)/2
+		x0 = -(n - 1)*dx - dx/2
+		x1 = x0 + (2*n - 1)*dx
+		y0 = -2*(n - 1)*self.pitch
+		even = ((x0, y0 - self.pitch/2), (x1, y0 + (2*n - 1.5)*self.pitch),
+		        (2*n - 1, 2*n - 1))
+		odd = ((x0, y0 - self.pitch), (x1, y0 + (2*n - 1)*self.pitch),
+		       (2*n - 1, 2*n))
+		return even, odd
+	
+	def mesh_filters(self, zmin=-10, zmax=10):
+		# openmc.MeshFilters for the even and odd columns; tally both and
+		# combine them with pin_values()
+		import openmc
+		filters = []
+		for name, (lower, upper, dim) in zip(("even", "odd"),
+		                                     self.mesh_geometry()):
+			mesh = openmc.RegularMesh(name="pins " + name)
+			mesh.lower_left = list(lower) + [zmin]
+			mesh.upper_right = list(upper) + [zmax]
+			mesh.dimension = list(dim) + [1]
+			filters.append(openmc.MeshFilter(mesh))
+		return filters
+	
+	def pin_values(self, even_values, odd_values):
+		# Gather the per-pin values, in flat index order, from the two mesh
+		# tallies. The first axis runs over the mesh bins, x fastest as OpenMC
+		# orders them; trailing axes, e.g. scores, are carried along.
+		(_, _, (nx, ny)), (_, _, (_, ny_odd)) = self.mesh_geometry()
+		even, ix, iy = self._mesh_bins()
+		ev = np.asarray(even_values).reshape((ny*nx, -1))
+		od = np.asarray(odd_values).reshape((ny_odd*nx, -1))
+		bins = iy*nx + ix
+		values = np.where(even[:, None], ev[np.where(even, bins, 0)],
+		                  od[np.where(even, 0, bins)])
+		return values.reshape((self.size,) + np.shape(even_values)[1:])
+	
+	def to_rings(self, values):
+		# Per-pin values split into OpenMC's rings, outermost first
+		values = np.asarray(values)
+		return [values[a:b] for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+
+
+if __name__ == "__main__":
+	from slice3d import Slice3D
+	index = PinIndex.from_model(Slice3D(2.25, 9.8, "SS316"))
+	print(index.size, "positions,", np.count_nonzero(index.kind == GUIDE_TUBE),
+	      "guide tubes")
+	dist, i = index.nearest([20.0], [-60.0])
+	print("Nearest pin to (20, -60):",
+	      "ring", index.ring[i[0]], "position", index.pos[i[0]],
+	      "at ({:.2f}, {:.2f})".format(index.x[i[0]], index.y[i[0]]))
@@ -1,17 +1,38 @@
 import openmc
-from scipy.optimize import fsolve
-from constants import *
+from constants import PRESSURE_MOD, PRESSURE_GAP, CLADS, CLAD_RATIOS
+from gap import solve_rgap
+import profiling
+from materials import fuel
 
+# Shared geometry, so many decks built in one process reuse the same
+# surfaces, cells and universes instead of creating new IDs for each.
+_cylinders = {}
+_universes = {}
 
 
-def vgap(Rgap, Rfuel):
-	return PI*(Rgap**2 - Rfuel**2)
+def clear_cache():
+	_cylinders.clear()
+	_universes.clear()
+
+
+def zcylinder(R, name=""):
+	if R not in _cylinders:
+		_cylinders[R] = openmc.ZCylinder(R=R, name=name)
+	return _cylinders[R]
+
+
+def cached_universe(key, build):
+	if key not in _universes:
+		_universes[key] = build()
+	return _universes[key]
+
 
 class Pincell:
-	def __init__(self, rfuel, clad_type, matdict):
+	def __init__(self, rfuel, clad_type, matdict, fuel_key=None):
+		# fuel_key: compositions.Fuel for materials.fuel(); None: matdict["Fuel"]
 		assert clad_type in CLADS
 		self.clad_type = clad_type
-		self.fuel_mat = matdict["Fuel"]
+		self.fuel_mat = matdict["Fuel"] if fuel_key is None else fuel(*fuel_key)
 		self.gap_mat = None
 		self.clad_mat = matdict[clad_type]
 		self.rfuel = rfuel
@@ -20,19 +41,23 @@ class Pincell:
 		self.mod_mat = matdict["Mod"]
 		self.matdict = matdict
 	
+	@profiling.timed("pincell solve")
 	def _get_rgap(self):
-		def solve_it(rg):
-			vg0 = vgap(rg, self.rfuel)
-			vg1 = vgap(rg, DR*self.rfuel)
-			return vg0/vg1 - PRESSURE_MOD/PRESSURE_GAP
-		rgap = fsolve(solve_it, 1.1*self.rfuel)
-		return rgap[0]
+		return solve_rgap(self.rfuel, PRESSURE_GAP, PRESSURE_MOD)
+	
+	@property
+	def _key(self):
+		return (self.rfuel, self.clad_type,
+		        self.fuel_mat, self.gap_mat, self.clad_mat, self.mod_mat)
 	
 	def build(self):
+		return cached_universe(("Pincell",) + self._key, self._build)
+	
+	def _build(self):
 		# All cylinders
-		fcyl = openmc.ZCylinder(R=self.rfuel, name="Fuel Cylinder")
-		gcyl = openmc.ZCylinder(R=self.rgap,  name="Gap Cylinder")
-		ccyl = openmc.ZCylinder(R=self.rclad, name="Clad Cylinder")
+		fcyl = zcylinder(self.rfuel, name="Fuel Cylinder")
+		gcyl = zcylinder(self.rgap,  name="Gap Cylinder")
+		ccyl = zcylinder(self.rclad, name="Clad Cylinder")
 		# Innermost ring: plain fuel
 		fring = openmc.Cell()
 		fring.region = -fcyl
@@ -64,26 +89,39 @@ class GuideTube:
 		
 	
 	def build(self):
-		icyl = openmc.ZCylinder(R=self.r_inner, name="Inside Tube")
-		ocyl = openmc.ZCylinder(R=self.r_outer, name="Tube Cylinder")
+		return cached_universe(("Guide Tube", self.rod) + self.pincell._key,
+		                       self._build)
+	
+	def build_rod(self):
+		pin = self.pincell
+		key = ("Control Rod", pin.rfuel, pin.matdict["B4C"],
+		       pin.matdict["SS316"], pin.mod_mat)
+		return cached_universe(key, self._build_rod)
+	
+	def _build_rod(self):
+		xcyl = zcylinder(self.pincell.rfuel)
+		ycyl = zcylinder(self.pincell.rgap)
+		xring = openmc.Cell()
+		xring.region = -xcyl
+		xring.fill = self.pincell.matdict["B4C"]
+		yring = openmc.Cell()
+		yring.region = +xcyl & -ycyl
+		yring.fill = self.pincell.matdict["SS316"]
+		zring = openmc.Cell()
+		zring.region = +ycyl
+		zring.fill = self.pincell.mod_mat
+		urod = openmc.Universe(name="Control Rod")
+		urod.add_cells((xring, yring, zring))
+		return urod
+	
+	def _build(self):
+		icyl = zcylinder(self.r_inner, name="Inside Tube")
+		ocyl = zcylinder(self.r_outer, name="Tube Cylinder")
 		# Innermost ring: water area
 		iring = openmc.Cell()
 		iring.region = -icyl
 		if self.rod:
-			xcyl = openmc.ZCylinder(R=self.pincell.rfuel)
-			ycyl = openmc.ZCylinder(R=self.pincell.rgap)
-			xring = openmc.Cell()
-			xring.region = -xcyl
-			xring.fill = self.pincell.matdict["B4C"]
-			yring = openmc.Cell()
-			yring.region = +xcyl & -ycyl
-			yring.fill = self.pincell.matdict["SS316"]
-			zring = openmc.Cell()
-			zring.region = +ycyl
-			zring.fill = self.pincell.mod_mat
-			urod = openmc.Universe()
-			urod.add_cells((xring, yring, zring))
-			iring.fill = urod
+			iring.fill = self.build_rod()
 		else:
 			iring.fill = self.pincell.mod_mat
 		# Next ring: Tube
@@ -3,6 +3,11 @@ import openmc
 from openmc import mgxs
 import matplotlib.pyplot as plt
 import numpy as np
+from constants import WIDTH, STEEL_THICK
+from deck_cache import parse_case_folder
+import compositions
+import preview
+from slice3d import Slice3D
 
 os.environ["OPENMC_CROSS_SECTIONS"] = \
 	'/home/share/nukedata/mcnp_endfb71_hdf5/cross_sections.xml'
@@ -15,7 +20,17 @@ lib.load_from_statepoint(sp)
 summ = sp.summary
 ru = summ.geometry.root_universe
 mgdata = lib.get_xsdata(ru, "U235-fission", nuclide="U235")
-micro_xs = mgdata.fission[0]/1712E-6  # TODO: Correctly calculate number density
+# The library homogenizes over the root universe, so the U235 number density
+# is the fuel's diluted by the fuel volume fraction of the slice
+case = parse_case_folder(FOLDER)
+if case["tag"] not in (None, "rodded"):
+	# Other fuels and axial zones are not recoverable from the folder name
+	raise ValueError("Not a default-fuel, unzoned case: " + FOLDER)
+model = Slice3D(case["radius"], case["pitch"], case["clad_type"],
+                rodded=case["tag"] == "rodded")
+fuel_fraction = preview.volume_fractions(model)["Fuel"]*(WIDTH - STEEL_THICK)/WIDTH
+n_u235 = compositions.fuel_composition()["U235"]*fuel_fraction
+micro_xs = mgdata.fission[0]/n_u235
 
 
 efilt = sp.filters[1]
@@ -1,5 +1,7 @@
 import numpy as np
 
+RADIAL_POINTS = 11  # mesh points through a thick wall, both surfaces included
+
 
 class PressureVessel:
 	def __init__(self, R, t, p_i, p_o):
@@ -29,18 +31,126 @@ class PressureVessel:
 		                 self.sig_r - self.sig_z,
 		                 self.sig_a - self.sig_z))
 	
+	@staticmethod
+	def _tresca(diffs):
+		return max(abs(diffs))
+	
+	@staticmethod
+	def _von_mises(diffs):
+		return np.sqrt(0.5*(diffs**2).sum())
+	
 	def get_tresca_stress(self):
-		return max(abs(self._get_diffs()))
+		return self._tresca(self._get_diffs())
 	
 	def get_von_mises_stress(self):
-		return np.sqrt(0.5*(self._get_diffs()**2).sum())
+		return self._von_mises(self._get_diffs())
 	
 	def get_max_stress(self):
-		return max(self.get_tresca_stress(), self.get_von_mises_stress())
+		diffs = self._get_diffs()
+		return max(self._tresca(diffs), self._von_mises(diffs))
+
+
+class PressureVesselArray(PressureVessel):
+	# Many vessels at once: R, t, p_i and p_o broadcast against each other.
+	# Every get_* method takes an optional preallocated `out` array.
+	def __init__(self, R, t, p_i, p_o):
+		R, t, p_i, p_o = np.broadcast_arrays(
+			*(np.asarray(a, dtype=float) for a in (R, t, p_i, p_o)))
+		super().__init__(R, t, p_i, p_o)
+		self._diffs = None
+	
+	@property
+	def shape(self):
+		return self.R.shape
+	
+	def _get_diffs(self):
+		# Reuse one (3, ...) work array for the life of the object
+		if self._diffs is None:
+			self._diffs = np.empty((3,) + self.shape)
+		sig_r, sig_a, sig_z = self.sig_r, self.sig_a, self.sig_z
+		np.subtract(sig_r, sig_a, out=self._diffs[0, ...])
+		np.subtract(sig_r, sig_z, out=self._diffs[1, ...])
+		np.subtract(sig_a, sig_z, out=self._diffs[2, ...])
+		return self._diffs
+	
+	def _out(self, out):
+		if out is None:
+			return np.empty(self.shape)
+		return out
+	
+	def _tresca(self, diffs, out=None):
+		out = self._out(out)
+		np.maximum(abs(diffs[0]), abs(diffs[1]), out=out)
+		return np.maximum(out, abs(diffs[2]), out=out)
+	
+	def _von_mises(self, diffs, out=None):
+		out = self._out(out)
+		np.einsum("i...,i...->...", diffs, diffs, out=out)
+		out *= 0.5
+		return np.sqrt(out, out=out)
+	
+	def get_tresca_stress(self, out=None):
+		return self._tresca(self._get_diffs(), out)
+	
+	def get_von_mises_stress(self, out=None):
+		return self._von_mises(self._get_diffs(), out)
+	
+	def get_max_stress(self, out=None):
+		diffs = self._get_diffs()
+		out = self._tresca(diffs, out)
+		return np.maximum(out, self._von_mises(diffs), out=out)
+
+
+class ThickWallVesselArray(PressureVesselArray):
+	# Lame stresses through the wall, from the inner radius R to R + t, on a
+	# mesh of `points` radii along a new last axis. The axial stress keeps
+	# the thin-wall convention (end load from p_o only) and tends to it, like
+	# the others, as t/R -> 0. Every get_* method works per mesh point;
+	# get_peak reduces over the mesh.
+	def __init__(self, R, t, p_i, p_o, points=RADIAL_POINTS):
+		super().__init__(R, t, p_i, p_o)
+		a2 = self.R**2
+		b2 = (self.R + self.t)**2
+		self.r = self.R[..., None] + self.t[..., None]*np.linspace(0, 1, points)
+		self._lame_a = ((self.p_i*a2 - self.p_o*b2)/(b2 - a2))[..., None]
+		self._lame_b = ((self.p_i - self.p_o)*a2*b2/(b2 - a2))[..., None]
+		self._axial = (-self.p_o*b2/(b2 - a2))[..., None]
+	
+	@property
+	def shape(self):
+		return self.r.shape
+	
+	@property
+	def sig_r(self):
+		return self._lame_a - self._lame_b/self.r**2
+	
+	@property
+	def sig_a(self):
+		return self._lame_a + self._lame_b/self.r**2
+	
+	@property
+	def sig_z(self):
+		return np.broadcast_to(self._axial, self.shape)
+	
+	def get_peak(self, criterion="max"):
+		"""Peak stress of each vessel and the radius where it occurs
+		
+		criterion: "tresca", "von_mises" or "max" (the larger of the two)
+		"""
+		getters = {"tresca": self.get_tresca_stress,
+		           "von_mises": self.get_von_mises_stress,
+		           "max": self.get_max_stress}
+		stress = getters[criterion]()
+		i = stress.argmax(axis=-1)[..., None]
+		return (np.take_along_axis(stress, i, -1)[..., 0],
+		        np.take_along_axis(self.r, i, -1)[..., 0])
 
 
 if __name__ == "__main__":
 	# test
 	pv1 = PressureVessel(2, 0.2, 2, 10)
 	print(pv1.get_max_stress())
-		
\ No newline at end of file
+	pva = PressureVesselArray([2, 2], [0.2, 0.4], 2, 10)
+	print(pva.get_max_stress())
+	tva = ThickWallVesselArray([2, 2], [0.2, 0.4], 2, 10)
+	print(tva.get_peak())
@@ -0,0 +1,122 @@
+# Fast lattice/material preview
+#
+# Rasterizes the xy plane of a Slice2D/Slice3D analytically with NumPy:
+# slice planes, vessel walls, water buffer, hex lattice pins and guide
+# tubes. Nothing is built or exported, and no cross sections or openmc
+# executable are needed. Colors come from materials.colormap.
+
+import numpy as np
+from constants import RAD_MAJ, STEEL_THICK, WIDTH
+import layout
+
+SQRT3 = np.sqrt(3)
+# Materials that colormap leaves to OpenMC's random colors
+DEFAULT_COLORS = {"Void": "white", "Fuel": "red", "Mod": "lightskyblue"}
+
+
+def pixel_grid(pixels=(1200, 1200), width=(RAD_MAJ*1.02,)*2,
+               origin=(WIDTH/4, -WIDTH/4)):
+	# Pixel centers like an openmc.Plot: row 0 at the top
+	nx, ny = pixels
+	dx = width[0]/nx
+	dy = width[1]/ny
+	x = origin[0] - width[0]/2 + dx*(np.arange(nx) + 0.5)
+	y = origin[1] + width[1]/2 - dy*(np.arange(ny) + 0.5)
+	return np.meshgrid(x, y)
+
+
+def rasterize(model, z=0, pixels=(1200, 1200), width=(RAD_MAJ*1.02,)*2,
+              origin=(WIDTH/4, -WIDTH/4)):
+	# Returns (ids, keys): an array of indices into the material keys
+	keys = ["Void", "Air", "SS316", "Mod", "Fuel", model.clad_type, "B4C"]
+	VOID, AIR, SS, MOD, FUEL, CLAD, B4C = range(len(keys))
+	x, y = pixel_grid(pixels, width, origin)
+	ids = np.full(x.shape, VOID, dtype=np.int8)
+	
+	rodded = model.rodded
+	if hasattr(model, "get_axial_zones"):
+		for top, (rodded, _) in model.get_axial_zones():
+			if z < top:
+				break
+	# Distance normal to the vessel wall facing this slice
+	wall = 0.5*x - SQRT3/2*y
+	inside = (x >= 0) & (y >= -RAD_MAJ) & (SQRT3/2*x + 0.5*y <= 0)
+	ids[inside] = AIR
+	ids[inside & (wall < RAD_MAJ*SQRT3/2)] = SS
+	ids[inside & (wall < (RAD_MAJ - STEEL_THICK)*SQRT3/2)] = MOD
+	fueled = inside & (wall < model.get_water_distance()*SQRT3/2)
+	if hasattr(model, "get_axial_zones") and z >= WIDTH - STEEL_THICK:
+		ids[inside] = SS
+		fueled[:] = False
+	
+	# Lattice: 0 pin, 1 guide tube
+	pitch = model.pitch
+	n = layout.num_rings(pitch)
+	table = np.zeros((2*n - 1, 2*n - 1), dtype=np.int8)
+	for q, r in layout.guide_tube_positions(n, model.guide_tubes):
+		table[q + n - 1, r + n - 1] = 1
+	xf = x[fueled]
+	yf = y[fueled]
+	q, r = layout.point_to_axial(xf, yf, pitch, n)
+	in_rings = np.maximum(np.maximum(abs(q), abs(r)), abs(q + r)) <= n - 1
+	kind = np.zeros(q.shape, dtype=np.int8)
+	kind[in_rings] = table[q[in_rings] + n - 1, r[in_rings] + n - 1]
+	xc, yc = layout.axial_to_point(q, r, pitch, n)
+	rho = np.hypot(xf - xc, yf - yc)
+	
+	pin = model.pincell
+	tube = model.gtube
+	sub = np.full(q.shape, MOD, dtype=np.int8)
+	is_pin = kind == 0
+	sub[is_pin & (rho < pin.rclad)] = CLAD
+	sub[is_pin & (rho < pin.rgap)] = VOID
+	sub[is_pin & (rho < pin.rfuel)] = FUEL
+	is_tube = kind == 1
+	sub[is_tube & (rho < tube.r_outer)] = CLAD
+	sub[is_tube & (rho < tube.r_inner)] = MOD
+	if rodded:
+		sub[is_tube & (rho < pin.rgap)] = SS
+		sub[is_tube & (rho < pin.rfuel)] = B4C
+	ids[fueled] = sub
+	return ids, keys
+
+
+def volume_fractions(model, z=0, pixels=(1200, 1200)):
+	# {material key: area fraction} of the slice's xy plane at height z
+	width = (RAD_MAJ*1.02,)*2
+	ids, keys = rasterize(model, z, pixels, width)
+	x, y = pixel_grid(pixels, width)
+	inside = (x >= 0) & (y >= -RAD_MAJ) & (SQRT3/2*x + 0.5*y <= 0)
+	counts = np.bincount(ids[inside], minlength=len(keys))
+	fractions = {}
+	for key, n in zip(keys, counts):
+		fractions[key] = fractions.get(key, 0) + n/inside.sum()
+	return fractions
+
+
+def get_colors(keys):
+	from matplotlib.colors import to_rgb
+	from materials import all_materials, colormap
+	rgb = []
+	for key in keys:
+		mat = all_materials.get(key)
+		if mat in colormap:
+			rgb.append(to_rgb(colormap[mat]))
+		else:
+			rgb.append(to_rgb(DEFAULT_COLORS.get(key, "white")))
+	return np.array(rgb)
+
+
+def render(model, **kwargs):
+	ids, keys = rasterize(model, **kwargs)
+	return get_colors(keys)[ids]
+
+
+def save_preview(model, filename, **kwargs):
+	import matplotlib.pyplot as plt
+	plt.imsave(filename, render(model, **kwargs))
+
+
+if __name__ == "__main__":
+	from slice3d import Slice3D
+	save_preview(Slice3D(2.25, 9.8, "SS316"), "preview.png")
@@ -0,0 +1,139 @@
+# Stage timers and counters for the deck builders
+#
+# Off by default: turn on with enable() or by setting PIZZARC_PROFILE=1,
+# and every stage() block and timed() function adds its wall time, call
+# count and the OpenMC objects (surfaces, cells, ...) created in it to the
+# current record. When a slice's export_to_xml writes anything, it also
+# writes the record to profile.json in the case folder; either way, it then
+# starts a new record. Nested stages each get the full time and objects of
+# everything inside them.
+#
+# While off, a stage costs one check of a module global.
+
+import os
+import sys
+import json
+import time
+import functools
+import contextlib
+
+ENV = "PIZZARC_PROFILE"
+PROFILE = "profile.json"
+# OpenMC classes whose IDs count the objects created
+OBJECTS = ("Surface", "Cell", "Universe", "Lattice", "Material", "Tally",
+           "Filter", "Mesh")
+
+_enabled = os.environ.get(ENV, "") not in ("", "0")
+_record = None
+
+
+def enable(on=True):
+	global _enabled, _record
+	_enabled = on
+	_record = None
+
+
+def is_enabled():
+	return _enabled
+
+
+def object_counts():
+	# IDs handed out so far for each kind of OpenMC object
+	openmc = sys.modules.get("openmc")
+	if openmc is None:
+		return dict.fromkeys(OBJECTS, 0)
+	return {name: len(getattr(getattr(openmc, name, None), "used_ids", ()))
+	        for name in OBJECTS}
+
+
+class Record:
+	def __init__(self):
+		self.stages = {}
+		self.counts = {}
+		self.start = object_counts()
+		self.t0 = time.perf_counter()
+	
+	def add_stage(self, name, seconds, objects):
+		entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0,
+		                                      "objects": {}})
+		entry["seconds"] += seconds
+		entry["calls"] += 1
+		for kind, n in objects.items():
+			if n:
+				entry["objects"][kind] = entry["objects"].get(kind, 0) + n
+	
+	def add_count(self, name, n=1):
+		self.counts[name] = self.counts.get(name, 0) + n
+	
+	def to_dict(self):
+		end = object_counts()
+		return {"seconds": time.perf_counter() - self.t0,
+		        "stages": self.stages,
+		        "counts": self.counts,
+		        "objects": {k: end[k] - self.start[k] for k in OBJECTS}}
+
+
+def current():
+	# The record being filled, or None while profiling is off
+	global _record
+	if not _enabled:
+		return None
+	if _record is None:
+		_record = Record()
+	return _record
+
+
+@contextlib.contextmanager
+def stage(name):
+	record = current()
+	if record is None:
+		yield
+		return
+	before = object_counts()
+	t0 = time.perf_counter()
+	try:
+		yield
+	finally:
+		seconds = time.perf_counter() - t0
+		after = object_counts()
+		record.add_stage(name, seconds, {k: after[k] - before[k] for k in OBJECTS})
+
+
+def timed(name):
+	# Decorator form of stage()
+	def decorator(func):
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if not _enabled:
+				return func(*args, **kwargs)
+			with stage(name):
+				return func(*args, **kwargs)
+		return wrapper
+	return decorator
+
+
+def count(name, n=1):
+	record = current()
+	if record is not None:
+		record.add_count(name, n)
+
+
+def reset():
+	# Drop the current record, e.g. when nothing was exported
+	global _record
+	_record = None
+
+
+def flush(folder, **info):
+	# Write the current record, with any extra info, to folder/profile.json
+	# and start a new one. Returns the path, or None while profiling is off.
+	global _record
+	record = current()
+	if record is None:
+		return None
+	data = dict(info, **record.to_dict())
+	path = os.path.join(folder, PROFILE)
+	with open(path, "w") as f:
+		json.dump(data, f, indent=1)
+	_record = None
+	return path
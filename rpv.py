@@ -1,17 +1,121 @@
-from pressure_vessel import PressureVessel
-from constants import *
+import numpy as np
+from pressure_vessel import ThickWallVesselArray, RADIAL_POINTS
+from constants import PI, PRESSURE_MOD, CLAD_YIELDS, WIDTH
 from math import sqrt
-from scipy.optimize import fsolve
 
-ahex = sqrt(3)*3/2*RAD_MAJ**2
-r_equiv = sqrt(ahex/PI)
+P_ATM = 0.1  # MPa
+SAFETY_FACTOR = 2
+BISECT_ITERS = 60
+BRACKET_ITERS = 10
 
 
-def stress(t):
-	rpv = PressureVessel(r_equiv, t, PRESSURE_MOD, 0.1)
-	#print(rpv.get_max_stress())
-	return rpv.get_max_stress()
+def equivalent_radius(width=WIDTH):
+	# Radius of the circle with the same area as the hexagon
+	rad_maj = np.asarray(width, dtype=float)/2
+	ahex = sqrt(3)*3/2*rad_maj**2
+	return np.sqrt(ahex/PI)
 
-boiler_t = fsolve(lambda t: stress(t) - CLAD_YIELDS["SS316"]/2, 20)[0]
-print(boiler_t)
 
+def allowable_stress(material="SS316", safety_factor=SAFETY_FACTOR):
+	material = np.asarray(material)
+	yields = np.array([CLAD_YIELDS[m] for m in material.ravel()], dtype=float)
+	return yields.reshape(material.shape)/safety_factor
+
+
+def _largest_u(terms, allowable):
+	# Largest u >= 0 with every |a + b*u| <= allowable; nan where even u = 0
+	# fails (|a| > allowable)
+	u = np.full(allowable.shape, np.inf)
+	feasible = np.ones(allowable.shape, dtype=bool)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		for a, b in terms:
+			feasible &= abs(a) <= allowable
+			uk = np.where(b > 0, (allowable - a)/b, (-allowable - a)/b)
+			np.minimum(u, np.where(b == 0, np.inf, uk), out=u)
+	return np.where(feasible, u, np.nan)
+
+
+def thin_wall_thickness(R, p_i, p_o, allowable):
+	# Every stress difference is a + b/t, and Tresca bounds von Mises,
+	# so the wall is as thin as the first difference to reach the allowable.
+	# nan where no thickness will do (|a| > allowable).
+	R, p_i, p_o, allowable = np.broadcast_arrays(
+		*(np.asarray(x, dtype=float) for x in (R, p_i, p_o, allowable)))
+	sig_r = -(p_i + p_o)/2
+	terms = ((sig_r, -R*(p_i - p_o)),
+	         (sig_r, p_o*R/2),
+	         (np.zeros_like(R), R*(p_i - p_o) + p_o*R/2))
+	with np.errstate(divide="ignore"):
+		return 1/_largest_u(terms, allowable)
+
+
+def lame_thickness(R, p_i, p_o, allowable):
+	# Thick-wall (Lame) thickness for p_i >= p_o. The peak of every stress
+	# difference is then at the inner surface, where, with u = R^2/(b^2 - R^2)
+	# for the outer radius b, each is again a + b*u; Tresca bounds von Mises.
+	R, p_i, p_o, allowable = np.broadcast_arrays(
+		*(np.asarray(x, dtype=float) for x in (R, p_i, p_o, allowable)))
+	dp = p_i - p_o
+	terms = ((-2*dp, -2*dp),
+	         (-dp, p_o),
+	         (dp, 2*dp + p_o))
+	u = _largest_u(terms, allowable)
+	with np.errstate(divide="ignore"):
+		return R*(np.sqrt(1 + 1/u) - 1)
+
+
+def peak_stress(R, t, p_i, p_o, points=RADIAL_POINTS):
+	# Thick-wall peak of max(Tresca, von Mises) and the radius where it occurs
+	return ThickWallVesselArray(R, t, p_i, p_o, points).get_peak()
+
+
+def bisect_thickness(R, p_i, p_o, allowable, t_hi, points=RADIAL_POINTS):
+	# Vectorized bisection on the thick-wall peak stress of the batch.
+	# t_hi is doubled until it satisfies the allowable (up to BRACKET_ITERS
+	# times; nan if it never does), then the root is bracketed by (0, t_hi].
+	hi = t_hi.copy()
+	for _ in range(BRACKET_ITERS):
+		over = peak_stress(R, hi, p_i, p_o, points)[0] > allowable
+		if not over.any():
+			break
+		hi[over] *= 2
+	else:
+		hi[over] = np.nan
+	lo = np.zeros_like(hi)
+	for _ in range(BISECT_ITERS):
+		mid = (lo + hi)/2
+		over = peak_stress(R, mid, p_i, p_o, points)[0] > allowable
+		lo = np.where(over, mid, lo)
+		hi = np.where(over, hi, mid)
+	return hi
+
+
+def required_thickness(R, p_i=PRESSURE_MOD, p_o=P_ATM,
+                       material="SS316", safety_factor=SAFETY_FACTOR):
+	# Sized on the thick-wall peak stress: in closed form where the internal
+	# pressure wins, otherwise by bisection from the thin-wall thickness
+	R, p_i, p_o, allowable = np.broadcast_arrays(
+		*(np.asarray(x, dtype=float) for x in
+		  (R, p_i, p_o, allowable_stress(material, safety_factor))))
+	t = np.array(lame_thickness(R, p_i, p_o, allowable))
+	outer = p_i < p_o
+	if outer.any():
+		t_thin = thin_wall_thickness(R[outer], p_i[outer], p_o[outer],
+		                             allowable[outer])
+		t_thin = np.where(np.isfinite(t_thin), t_thin, R[outer])
+		t[outer] = bisect_thickness(R[outer], p_i[outer], p_o[outer],
+		                            allowable[outer], t_thin)
+	if t.ndim == 0:
+		return float(t)
+	return t
+
+
+if __name__ == "__main__":
+	r_equiv = equivalent_radius(WIDTH)
+	boiler_t = required_thickness(r_equiv, PRESSURE_MOD, P_ATM, "SS316")
+	print(boiler_t)
+	print(peak_stress(r_equiv, boiler_t, PRESSURE_MOD, P_ATM))
+	# Every candidate width and moderator pressure at once
+	widths = np.linspace(200, 300, 6)[:, None]
+	pressures = np.linspace(5, 15, 5)[None, :]
+	print(required_thickness(equivalent_radius(widths), pressures, P_ATM, "SS316"))
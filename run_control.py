@@ -0,0 +1,64 @@
+# Batch and particle control for the exported settings
+#
+# Instead of a fixed number of batches, each deck runs until keff (and, where
+# the deck has one, the flux tally) reaches a target uncertainty, checked
+# every `interval` batches after a minimum number of active ones, up to
+# `max_batches`. Converged cases stop early.
+
+from collections import namedtuple
+
+KEFF_STD = 50E-5       # absolute standard deviation of keff
+FLUX_REL_ERR = 0.05    # relative error of every flux tally bin; None: off
+INACTIVE = 20
+MIN_ACTIVE = 10
+MAX_BATCHES = 50
+INTERVAL = 5
+PARTICLES = 10000
+# Particle histories allowed for a whole sweep if every case ran to
+# MAX_BATCHES; the particles per batch of each case are picked to fit, but
+# never more than PARTICLES, so a sweep only ever runs cheaper than one case
+SWEEP_BUDGET = 5E8
+MIN_PARTICLES = 2000
+
+RunControl = namedtuple("RunControl", ("particles", "keff_std", "flux_rel_err",
+                                       "inactive", "min_active", "max_batches",
+                                       "interval"))
+RunControl.__new__.__defaults__ = (PARTICLES, KEFF_STD, FLUX_REL_ERR, INACTIVE,
+                                   MIN_ACTIVE, MAX_BATCHES, INTERVAL)
+
+
+def particles_for(num_cases, budget=SWEEP_BUDGET, max_batches=MAX_BATCHES,
+                  lo=MIN_PARTICLES, hi=PARTICLES):
+	# Particles per batch, rounded down to a thousand, for `num_cases` decks
+	per_batch = budget/(max(num_cases, 1)*max_batches)
+	return int(min(max(per_batch//1000*1000, lo), hi))
+
+
+def for_sweep(num_cases, **kwargs):
+	# RunControl with the particles picked from the sweep size
+	max_batches = kwargs.get("max_batches", MAX_BATCHES)
+	return RunControl(particles=particles_for(num_cases, max_batches=max_batches),
+	                  **kwargs)
+
+
+def apply_settings(settings, control):
+	assert control.inactive + control.min_active <= control.max_batches
+	settings.particles = control.particles
+	settings.inactive = control.inactive
+	# With triggers on, `batches` is the minimum before they are checked
+	settings.batches = control.inactive + control.min_active
+	settings.keff_trigger = {"type": "std_dev", "threshold": control.keff_std}
+	settings.trigger_active = True
+	settings.trigger_max_batches = control.max_batches
+	settings.trigger_batch_interval = control.interval
+	return settings
+
+
+def tally_triggers(control, scores=("flux",)):
+	# Triggers for the flux tally, if the control has one
+	if control.flux_rel_err is None:
+		return []
+	import openmc
+	trigger = openmc.Trigger("rel_err", control.flux_rel_err)
+	trigger.scores = list(scores)
+	return [trigger]
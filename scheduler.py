@@ -0,0 +1,174 @@
+# Local job scheduler for exported sweeps
+#
+# Finds every exported case folder under a sweep directory and runs openmc in
+# each one, several cases at a time. The cores are split between concurrent
+# jobs and, within each job, MPI ranks and OpenMP threads; small slice models
+# get more out of many narrow jobs than one wide one.
+#
+# Each folder gets a run record (run.json) with the status, wall time and the
+# core split it ran with. Cases that finished with the inputs now in their
+# manifest are skipped, so an interrupted sweep picks up where it stopped.
+#
+# usage: python scheduler.py [SWEEP_DIR] [--cores N] [--mpi N] [--threads N]
+#                            [--executable CMD] [--force]
+#
+# For a dry run, `--executable "python fake_openmc.py"` stands in for openmc;
+# relative paths in the command are taken from the current directory.
+
+import os
+import sys
+import glob
+import json
+import time
+import shlex
+import subprocess
+import traceback
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from deck_cache import Manifest, digest, parse_case_folder, VARIANT_PREFIX
+
+OPENMC = "openmc"
+MPIEXEC = "mpiexec"
+RECORD = "run.json"
+LOG = "openmc.log"
+
+# concurrent jobs, MPI ranks and OpenMP threads per job
+CoreSplit = namedtuple("CoreSplit", ("jobs", "mpi", "threads"))
+
+
+def find_cases(root="."):
+	# Case folders with an exported deck in them, and their control-worth
+	# configurations (see control_worth.py)
+	folders = []
+	for path in glob.glob(os.path.join(root, "*", "*", "settings.xml")):
+		folder = os.path.dirname(path)
+		if parse_case_folder(folder) is not None:
+			folders.append(folder)
+			folders += [os.path.dirname(p) for p in glob.glob(
+				os.path.join(folder, VARIANT_PREFIX + "*", "settings.xml"))]
+	return sorted(folders)
+
+
+def split_cores(num_cases, cores=None, mpi=1, threads=None):
+	# By default, as many single-rank jobs as there are cases to fill the
+	# cores, with any cores left over shared out as threads
+	cores = cores or os.cpu_count() or 1
+	if threads is None:
+		threads = max(1, cores//(mpi*max(num_cases, 1)))
+	jobs = max(1, min(num_cases, cores//(mpi*threads)))
+	return CoreSplit(jobs, mpi, threads)
+
+
+def command(split, executable=OPENMC):
+	cmd = shlex.split(executable) if isinstance(executable, str) else list(executable)
+	# Jobs run in their case folders, so files named relative to here
+	# (like a script for python) need absolute paths
+	cmd = [os.path.abspath(arg) if os.path.isfile(arg) else arg for arg in cmd]
+	cmd += ["--threads", str(split.threads)]
+	if split.mpi > 1:
+		cmd = [MPIEXEC, "-n", str(split.mpi)] + cmd
+	return cmd
+
+
+def read_record(folder):
+	path = os.path.join(folder, RECORD)
+	if not os.path.isfile(path):
+		return None
+	with open(path) as f:
+		return json.load(f)
+
+
+def write_record(folder, record):
+	path = os.path.join(folder, RECORD)
+	with open(path + ".tmp", "w") as f:
+		json.dump(record, f, indent=1)
+	os.replace(path + ".tmp", path)
+
+
+def inputs_key(folder):
+	# What was exported into the folder, per its manifest
+	return digest(Manifest(folder).entries)
+
+
+def is_done(folder):
+	record = read_record(folder)
+	return (record is not None and record["status"] == "done" and
+	        record["inputs"] == inputs_key(folder) and
+	        bool(glob.glob(os.path.join(folder, "statepoint.*.h5"))))
+
+
+def run_case(folder, split, executable=OPENMC):
+	cmd = command(split, executable)
+	record = dict(status="running", command=cmd, inputs=inputs_key(folder),
+	              mpi=split.mpi, threads=split.threads, wall_time=None,
+	              returncode=None, started=time.time())
+	write_record(folder, record)
+	env = dict(os.environ, OMP_NUM_THREADS=str(split.threads))
+	t0 = time.perf_counter()
+	with open(os.path.join(folder, LOG), "w") as log:
+		proc = subprocess.run(cmd, cwd=folder, env=env,
+		                      stdout=log, stderr=subprocess.STDOUT)
+	record["wall_time"] = time.perf_counter() - t0
+	record["returncode"] = proc.returncode
+	record["status"] = "done" if proc.returncode == 0 else "failed"
+	write_record(folder, record)
+	return record
+
+
+def run_all(root=".", cores=None, mpi=1, threads=None, executable=OPENMC,
+            force=False, stream=sys.stdout):
+	# Returns ({folder: record} of the cases run, {folder: error} of failures)
+	folders = find_cases(root)
+	todo = [f for f in folders if force or not is_done(f)]
+	skipped = len(folders) - len(todo)
+	if skipped:
+		print("{} of {} cases already done".format(skipped, len(folders)),
+		      file=stream)
+	if not todo:
+		return {}, {}
+	split = split_cores(len(todo), cores, mpi, threads)
+	print("{} jobs at a time, {} MPI rank(s) x {} thread(s) each".format(*split),
+	      file=stream, flush=True)
+	done = {}
+	failed = {}
+	n = len(todo)
+	with ThreadPoolExecutor(max_workers=split.jobs) as pool:
+		futures = {pool.submit(run_case, folder, split, executable): folder
+		           for folder in todo}
+		for i, future in enumerate(as_completed(futures), 1):
+			folder = futures[future]
+			try:
+				record = future.result()
+			except Exception:
+				# Could not even start the executable
+				failed[folder] = traceback.format_exc()
+				status = "FAILED"
+			else:
+				if record["status"] == "done":
+					done[folder] = record
+				else:
+					failed[folder] = "exit code {}, see {}".format(
+						record["returncode"], os.path.join(folder, LOG))
+				status = "{} ({:.1f} s)".format(record["status"],
+				                                record["wall_time"])
+			print("[{}/{}] {} {}".format(i, n, os.path.relpath(folder, root), status),
+			      file=stream, flush=True)
+	for folder, error in failed.items():
+		print("\n{}:\n{}".format(folder, error), file=stream)
+	print("{} run, {} failed".format(len(done), len(failed)), file=stream)
+	return done, failed
+
+
+if __name__ == "__main__":
+	import argparse
+	parser = argparse.ArgumentParser(description="Run every exported case.")
+	parser.add_argument("root", nargs="?", default=".")
+	parser.add_argument("--cores", type=int)
+	parser.add_argument("--mpi", type=int, default=1)
+	parser.add_argument("--threads", type=int)
+	parser.add_argument("--executable", default=OPENMC)
+	parser.add_argument("--force", action="store_true")
+	args = parser.parse_args()
+	_, failures = run_all(args.root, args.cores, args.mpi, args.threads,
+	                      args.executable, args.force)
+	sys.exit(1 if failures else 0)
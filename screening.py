@@ -0,0 +1,138 @@
+# Fast keff screening from homogenized cross sections
+#
+# One-group diffusion on the whole core, with the slice's homogenized
+# one-group cross sections from aggregated sweep results (aggregate.py):
+#     k_inf = nu-Sigma_f/Sigma_a,    M^2 = D/Sigma_a = 1/(3*Sigma_tr*Sigma_a)
+#     keff = k_inf/(1 + M^2*B^2)
+# B^2 is the geometric buckling of the fueled core, taken as a bare
+# cylinder with the area of the fueled hexagon, which shrinks with the
+# pitch. nu-Sigma_f, Sigma_a and Sigma_tr are interpolated over (radius,
+# pitch) for each clad type with surrogate.Surrogate. Thousands of
+# candidates take a few milliseconds, and only those that screen well need
+# a full transport run.
+#
+# usage: python screening.py [RESULTS.npz] [K_MIN]
+
+import numpy as np
+from constants import CLADS, RAD_MAJ, WIDTH, STEEL_THICK
+from rpv import equivalent_radius
+from surrogate import Surrogate, grid_points
+
+# Neutrons per fission, for results without nu-fission tallies
+NU = 2.43
+BESSEL_ZERO = 2.404826
+K_MIN = 1.0
+
+
+def fueled_radius(pitch):
+	# Equivalent radius of the fueled hexagon, out to Slice3D's water distance
+	water_distance = RAD_MAJ - STEEL_THICK - np.sqrt(3)/2*np.asarray(pitch)/1.1
+	return equivalent_radius(2*water_distance)
+
+
+def buckling(pitch, height=2*(WIDTH - STEEL_THICK)):
+	# Geometric buckling of a bare cylinder with the fueled core's area. The
+	# slices reflect at z = 0, so the full core is twice their fuel height.
+	return (np.pi/height)**2 + (BESSEL_ZERO/fueled_radius(pitch))**2
+
+
+def _total(results, score):
+	# Sum over the nuclides of one score, and its standard deviation
+	prefix = score + "_"
+	keys = [k for k in results
+	        if k.startswith(prefix) and not k.endswith("_std")]
+	if not keys:
+		return None, None
+	total = sum(np.asarray(results[k], dtype=float) for k in keys)
+	var = sum(np.asarray(results[k + "_std"], dtype=float)**2 for k in keys
+	          if k + "_std" in results)
+	return total, np.sqrt(var)
+
+
+def macroscopic(results):
+	# (nu-Sigma_f, Sigma_a, Sigma_tr) of every case, in 1/cm
+	nu_fission, _ = _total(results, "nu-fission")
+	if nu_fission is None:
+		fission, _ = _total(results, "fission")
+		nu_fission = NU*fission
+	absorption, _ = _total(results, "absorption")
+	transport, _ = _total(results, "transport")
+	for name, xs in (("absorption", absorption), ("transport", transport)):
+		if xs is None:
+			raise KeyError("No {} cross sections in the results".format(name))
+	return nu_fission, absorption, transport
+
+
+def migration_area(absorption, transport):
+	# D/Sigma_a, with the diffusion coefficient D = 1/(3*Sigma_tr)
+	return 1/(3*transport*absorption)
+
+
+class Screener:
+	def __init__(self, results, clads=CLADS):
+		xs = macroscopic(results)
+		self.models = {}
+		for clad in clads:
+			rows = ((results["clad_type"] == clad) & (results["tag"] == "") &
+			        np.all([np.isfinite(y) for y in xs], axis=0))
+			if not rows.any():
+				continue
+			x = np.column_stack([results["radius"][rows], results["pitch"][rows]])
+			self.models[clad] = tuple(Surrogate(x, y[rows], log=True) for y in xs)
+	
+	def predict(self, radius, pitch, clad_type):
+		"""(keff, k_inf, std of keff), broadcast over the arguments
+	
+		The std is from the interpolation only, not the diffusion model.
+		"""
+		radius, pitch, clad_type = np.broadcast_arrays(radius, pitch, clad_type)
+		keff = np.full(radius.shape, np.nan)
+		k_inf = np.full(radius.shape, np.nan)
+		std = np.full(radius.shape, np.nan)
+		for clad, (nsf_model, sa_model, str_model) in self.models.items():
+			rows = clad_type == clad
+			if not rows.any():
+				continue
+			x = np.column_stack([radius[rows], pitch[rows]])
+			nsf, nsf_std = nsf_model.predict(x)
+			sa, sa_std = sa_model.predict(x)
+			tr, tr_std = str_model.predict(x)
+			m2b2 = migration_area(sa, tr)*buckling(pitch[rows])
+			k_inf[rows] = nsf/sa
+			keff[rows] = k_inf[rows]/(1 + m2b2)
+			# Relative sensitivities of keff to each cross section
+			leak = m2b2/(1 + m2b2)
+			rel = np.sqrt((nsf_std/nsf)**2 + ((1 - leak)*sa_std/sa)**2 +
+			              (leak*tr_std/tr)**2)
+			std[rows] = keff[rows]*rel
+		return keff, k_inf, std
+	
+	def screen(self, radii, pitches, clads=None, k_min=K_MIN, nsigma=2):
+		# deck_sweep.Cases on the radii x pitches grid that could reach k_min
+		# within nsigma, most reactive first
+		from deck_sweep import Case
+		x = grid_points(radii, pitches)
+		cases = []
+		for clad in clads or tuple(self.models):
+			keff, _, std = self.predict(x[:, 0], x[:, 1], clad)
+			for i in np.flatnonzero(keff + nsigma*std >= k_min):
+				cases.append((keff[i], Case(float(x[i, 0]), float(x[i, 1]), clad)))
+		return [case for _, case in sorted(cases, key=lambda c: -c[0])]
+
+
+if __name__ == "__main__":
+	import sys
+	import time
+	from aggregate import RESULTS, load_results
+	path = sys.argv[1] if len(sys.argv) > 1 else RESULTS
+	k_min = float(sys.argv[2]) if len(sys.argv) > 2 else K_MIN
+	screener = Screener(load_results(path))
+	radii = np.linspace(1.5, 2.75, 50)
+	pitches = np.linspace(7.5, 12.0, 50)
+	t0 = time.perf_counter()
+	cases = screener.screen(radii, pitches, k_min=k_min)
+	n = len(radii)*len(pitches)*len(screener.models)
+	print("Screened {} designs in {:.3f} s: {} could reach keff {}".format(
+		n, time.perf_counter() - t0, len(cases), k_min))
+	for case in cases[:10]:
+		print("\t", case)
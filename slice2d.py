@@ -2,71 +2,71 @@ import os
 import openmc
 from openmc.stats import Box
 from materials import all_materials, colormap
-from constants import *
+from constants import CLADS, WIDTH, GAP, STEEL_THICK, RAD_MAJ, RAD_MIN
 from pincell import Pincell, GuideTube
-from math import *
+import layout
+import profiling
+from run_control import RunControl, apply_settings
+from compositions import Fuel
+from deck_cache import (Manifest, case_folder, case_tag, digest,
+                        constants_state, materials_state, colors_state,
+                        source_state)
+from math import cos, pi, sqrt
 
 
 class Slice2D:
+	# The original hand layout, core-relative (q, s); it is not a regular
+	# pattern, so it is listed as is
+	guide_tubes = ((0, 0), (0, -4), (0, -9), (0, -18), (0, -22), (0, -26),
+	               (4, -8), (4, -13), (4, -18), (4, -22), (4, -26),
+	               (8, -18), (8, -22), (8, -26), (13, -26))
+	
 	def __init__(self, radius, pitch, clad_type,
-	             rodded=False, matdict=all_materials):
+	             rodded=False, matdict=all_materials, fuel=None,
+	             run_control=None, source_file=None):
+		# fuel: compositions.Fuel (enrichment, Mo fraction, density) of the
+		# U-Mo; None keeps matdict["Fuel"]
+		# run_control: particles, batches and triggers; see run_control.py
+		# source_file: start from these fission sites instead of a uniform box,
+		# relative to the case folder (see warm_start.py)
 		assert clad_type in CLADS
 		self.radius = radius
 		self.pitch = pitch
 		self.clad_type = clad_type
 		self.matdict = matdict
+		self.fuel = None if fuel is None else Fuel(*fuel)
+		self.run_control = run_control or RunControl()
+		self.source_file = source_file
 		self._geometry = None
-		self.pincell = Pincell(self.radius, self.clad_type, self.matdict)
+		# (lattice, pincell it was filled with), in the order built
+		self._lattices = []
+		self.pincell = Pincell(self.radius, self.clad_type, self.matdict, self.fuel)
 		self.gtube = GuideTube(self.pincell, rodded)
 	
+	@profiling.timed("lattice")
 	def get_lattice(self):
 		upin = self.pincell.build()
 		ugtb = self.gtube.build()
 		hlat = openmc.HexLattice()
 		hlat.pitch = [self.pitch]*2
-
-		unis = [
-			[upin]*78,
-			[upin]*72,
-			[upin]*66,
-			[upin]*60,
-			[upin]*54,
-			[upin]*48,
-			[upin]*42,
-			[upin]*36,
-			[upin]*30,
-			[upin]*24,
-			[upin]*18,
-			[upin]*12,
-			[upin]*6,
-			[ugtb]
-		]
-		hlat.center = (0, -self.pitch*(len(unis) - 1), 0)
-		# Center row
-		unis[0][39] = ugtb
-		unis[4][27] = ugtb
-		unis[8][15] = ugtb
-		unis[9][0] = ugtb
-		unis[4][0] = ugtb
-		unis[0][0] = ugtb
-		# Next row
-		unis[0][35] = ugtb
-		unis[4][23] = ugtb
-		unis[9][4] = ugtb
-		unis[8][11] = ugtb
-		unis[4][4] = ugtb
-		# Another row
-		unis[0][31] = ugtb
-		unis[4][19] = ugtb
-		unis[5][13] = ugtb
-		# Corner
-		unis[0][26] = ugtb
-		
-		hlat.universes = [unis]
+		n = layout.num_rings(self.pitch)
+		gtubes = layout.guide_tube_positions(n, self.guide_tubes)
+		special = dict.fromkeys(gtubes, ugtb)
+		hlat.universes = [layout.make_universes(n, upin, special)]
+		profiling.count("lattice positions", sum(map(len, hlat.universes[0])))
+		profiling.count("guide tubes", len(gtubes))
+		hlat.center = (0, -self.pitch*(n - 1), 0)
 		hlat.outer = upin
+		self._lattices.append((hlat, self.pincell))
 		print(hlat.show_indices(hlat.num_rings))
 		return hlat
 	
+	def get_water_distance(self):
+		# Along -y from the core center to the plane between the lattice
+		# and the water buffer
+		return RAD_MAJ - STEEL_THICK - sqrt(3)/2*self.pitch
+	
+	@profiling.timed("build")
 	def build(self):
 		x0 = openmc.XPlane(x0=0, boundary_type="reflective")
 		
@@ -82,8 +82,9 @@ class Slice2D:
 		
 		ru = openmc.Universe(name="root universe")
 		radialu = openmc.Universe(name="radial universe")
+		self._lattices = []
 		lattice = self.get_lattice()
-		dist = RAD_MAJ - STEEL_THICK - sqrt(3)/2*self.pitch
+		dist = self.get_water_distance()
 		right_inner_water = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
 		                                D=dist*cos(pi/6))
 		# Fueled area
@@ -121,32 +122,95 @@ class Slice2D:
 		p1.origin = [WIDTH/4, -WIDTH/4, 0]
 		return [p1]
 	
-	def export_to_xml(self):
-		folder_name = "{clad_type}/radius{radius:.2f}_pitch{pitch:.2f}/".format(**vars(self))
-		if not os.path.isdir(folder_name):
-			os.makedirs(folder_name)
-		self._geometry.export_to_xml(folder_name + "geometry.xml")
-		mfile = openmc.Materials()
-		for mat in all_materials.values():
-			mfile.append(mat)
-		mfile.export_to_xml(folder_name + "materials.xml")
-		pfile = openmc.Plots()
-		pfile += self.make_plots()
-		# noinspection PyTypeChecker
-		for p in pfile:
-			if p.color_by == "material":
-				p.colors = colormap
-		pfile.export_to_xml(folder_name + "plots.xml")
-		sfile = openmc.Settings()
-		sfile.particles = 10000
-		sfile.batches = 50
-		sfile.inactive = 20
-		sfile.source = openmc.Source(space=Box([-RAD_MIN/2, -RAD_MAJ, -10], [RAD_MIN/2, 0, 10]))
-		sfile.export_to_xml(folder_name + "settings.xml")
-		print("Exported to:", folder_name)
+	def get_source_box(self):
+		return Box([-RAD_MIN/2, -RAD_MAJ, -10], [RAD_MIN/2, 0, 10])
+	
+	def get_source(self):
+		if self.source_file:
+			return openmc.Source(filename=self.source_file)
+		return openmc.Source(space=self.get_source_box())
+	
+	@property
+	def rodded(self):
+		return self.gtube.rod
+	
+	@property
+	def folder_name(self):
+		return case_folder(self.clad_type, self.radius, self.pitch,
+		                   case_tag(self.fuel, rodded=self.rodded))
+	
+	def get_materials(self):
+		mats = list(all_materials.values())
+		if self.pincell.fuel_mat not in mats:
+			mats.append(self.pincell.fuel_mat)
+		return mats
+	
+	def _cache_keys(self):
+		consts = constants_state()
+		code = source_state(__name__, "pincell", "gap", "layout", "materials",
+		                    "deck_cache", "run_control")
+		# The geometry fills cells by material ID, so it depends on the
+		# exported materials as well
+		mats = materials_state(dict(enumerate(self.get_materials())))
+		geom = digest("geometry", self.radius, self.pitch, self.clad_type,
+		              self.rodded, self.fuel, consts,
+		              materials_state(self.matdict), mats, code)
+		return {
+			"geometry.xml": geom,
+			"materials.xml": digest("materials", mats),
+			"plots.xml": digest("plots", consts, colors_state(colormap), code),
+			"settings.xml": digest("settings", self.run_control,
+			                       self.source_file, consts, code),
+		}
+	
+	def export_to_xml(self, force=False):
+		folder_name = self.folder_name
+		os.makedirs(folder_name, exist_ok=True)
+		manifest = Manifest(folder_name)
+		keys = self._cache_keys()
+		stale = [fname for fname, key in keys.items()
+		         if force or not manifest.is_current(fname, key)]
+		if not stale:
+			print("Up to date:", folder_name)
+			profiling.reset()
+			return stale
+		if "geometry.xml" in stale:
+			if self._geometry is None:
+				self.build()
+			with profiling.stage("export geometry.xml"):
+				self._geometry.export_to_xml(folder_name + "geometry.xml")
+			manifest.update("geometry.xml", keys["geometry.xml"])
+		if "materials.xml" in stale:
+			mfile = openmc.Materials()
+			for mat in self.get_materials():
+				mfile.append(mat)
+			with profiling.stage("export materials.xml"):
+				mfile.export_to_xml(folder_name + "materials.xml")
+			manifest.update("materials.xml", keys["materials.xml"])
+		if "plots.xml" in stale:
+			pfile = openmc.Plots()
+			pfile += self.make_plots()
+			# noinspection PyTypeChecker
+			for p in pfile:
+				if p.color_by == "material":
+					p.colors = colormap
+			with profiling.stage("export plots.xml"):
+				pfile.export_to_xml(folder_name + "plots.xml")
+			manifest.update("plots.xml", keys["plots.xml"])
+		if "settings.xml" in stale:
+			sfile = openmc.Settings()
+			apply_settings(sfile, self.run_control)
+			sfile.source = self.get_source()
+			# Leave the converged sites for warm starts of other cases
+			sfile.sourcepoint = {"separate": True}
+			with profiling.stage("export settings.xml"):
+				sfile.export_to_xml(folder_name + "settings.xml")
+			manifest.update("settings.xml", keys["settings.xml"])
+		print("Exported to:", folder_name, "({})".format(", ".join(stale)))
+		profiling.flush(folder_name, case=folder_name, exported=stale)
+		return stale
 
 
 if __name__ == '__main__':
 	bar = Slice2D(2, 8, "Zr4", rodded=True)
-	bar.build()
 	bar.export_to_xml()
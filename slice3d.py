@@ -1,125 +1,145 @@
 import os
+from collections import namedtuple
 import numpy as np
 import openmc
-from openmc import mgxs
 from openmc.stats import Box
-from materials import all_materials, colormap
-from constants import *
+from materials import all_materials, colormap, moderator
+from constants import CLADS, WIDTH, GAP, STEEL_THICK, RAD_MAJ, RAD_MIN
 from pincell import Pincell, GuideTube
-from math import *
+import layout
+import profiling
+from run_control import RunControl, apply_settings, tally_triggers
+from compositions import Fuel, WATER_DENSITY
+from deck_cache import (Manifest, case_folder, case_tag, digest,
+                        constants_state, materials_state, colors_state,
+                        source_state)
+from math import cos, pi, sqrt
+
+
+# One axial zone of the fuel, from the top of the zone below it up to `top`
+# (cm). rodded and mod_density (g/cc) of None keep the slice's defaults.
+AxialZone = namedtuple("AxialZone", ("top", "rodded", "mod_density"))
+AxialZone.__new__.__defaults__ = (None, None)
 
 
 class Slice3D:
+	# The original hand layout, core-relative (q, s). It follows a spacing-3
+	# pattern only out to s = -12; further out it does not, which matters
+	# once the fueled area reaches that far (pitch below about 7 cm)
+	guide_tubes = ((0, 0), (0, -3), (0, -6), (0, -9), (0, -12), (0, -14),
+	               (0, -17), (0, -20), (0, -23), (0, -26),
+	               (3, -6), (3, -9), (3, -12), (3, -14), (3, -17), (3, -20),
+	               (3, -23), (3, -26),
+	               (6, -6), (6, -9), (6, -12), (6, -17), (6, -20), (6, -23),
+	               (6, -26),
+	               (9, -9), (9, -12), (9, -18), (9, -20), (9, -23), (9, -26),
+	               (13, -26))
+	
 	def __init__(self, radius, pitch, clad_type,
-	             rodded=False, matdict=all_materials):
+	             rodded=False, matdict=all_materials, fuel=None, zones=(),
+	             run_control=None, source_file=None):
+		# fuel: compositions.Fuel (enrichment, Mo fraction, density) of the
+		# U-Mo; None keeps matdict["Fuel"]
+		# run_control: particles, batches and triggers; see run_control.py
+		# source_file: start from these fission sites instead of a uniform box,
+		# relative to the case folder (see warm_start.py)
+		# zones: AxialZones from the bottom up; any fuel above the last one
+		# is a zone with the defaults
 		assert clad_type in CLADS
 		self.radius = radius
 		self.pitch = pitch
 		self.clad_type = clad_type
 		self.matdict = matdict
+		self.fuel = None if fuel is None else Fuel(*fuel)
+		self.run_control = run_control or RunControl()
+		self.source_file = source_file
+		# A zone at the stock moderator's own density is the same as None, so
+		# it merges with default zones and shares their lattice
+		mod_default = None
+		if matdict["Mod"] is all_materials["Mod"]:
+			mod_default = WATER_DENSITY
+		self.zones = tuple(
+			zone._replace(mod_density=None) if zone.mod_density == mod_default
+			else zone for zone in (AxialZone(*z) for z in zones))
+		tops = [zone.top for zone in self.zones]
+		assert all(z0 < z1 for z0, z1 in zip([0] + tops, tops))
+		assert not tops or tops[-1] <= WIDTH - STEEL_THICK
 		self._geometry = None
+		# (lattice, pincell it was filled with), in the order built
+		self._lattices = []
 		self._lattice = None
-		self.pincell = Pincell(self.radius, self.clad_type, self.matdict)
+		self._walls = None
+		self._radial = {}
+		self.pincell = Pincell(self.radius, self.clad_type, self.matdict, self.fuel)
 		self.gtube = GuideTube(self.pincell, rodded)
 	
-	def get_lattice(self):
-		upin = self.pincell.build()
-		ugtb = self.gtube.build()
+	@profiling.timed("lattice")
+	def get_lattice(self, pincell=None, gtube=None):
+		pincell = pincell or self.pincell
+		gtube = gtube or self.gtube
+		upin = pincell.build()
+		ugtb = gtube.build()
 		hlat = openmc.HexLattice()
 		hlat.pitch = [self.pitch]*2
-		
-		unis = [
-			[upin]*78,
-			[upin]*72,
-			[upin]*66,
-			[upin]*60,
-			[upin]*54,
-			[upin]*48,
-			[upin]*42,
-			[upin]*36,
-			[upin]*30,
-			[upin]*24,
-			[upin]*18,
-			[upin]*12,
-			[upin]*6,
-			[ugtb]
-		]
-		hlat.center = (0, -self.pitch*(len(unis) - 1), 0)
-		# Center row
-		unis[0][39] = ugtb
-		unis[3][30] = ugtb
-		unis[6][21] = ugtb
-		unis[9][12] = ugtb
-		unis[12][3] = ugtb
-		unis[13][0] = upin
-		unis[12][0] = ugtb
-		unis[9][0] = ugtb
-		unis[6][0] = ugtb
-		unis[3][0] = ugtb
-		unis[0][0] = ugtb
-		# Next row
-		unis[0][36] = ugtb
-		unis[3][27] = ugtb
-		unis[6][18] = ugtb
-		unis[9][9] = ugtb
-		unis[10][4] = ugtb
-		unis[9][3] = ugtb
-		unis[6][3] = ugtb
-		unis[3][3] = ugtb
-		# Another row
-		unis[0][33] = ugtb
-		unis[3][24] = ugtb
-		unis[6][15] = ugtb
-		unis[7][10] = ugtb
-		unis[6][6] = ugtb
-		unis[3][6] = ugtb
-		unis[0][6] = ugtb
-		# Another row
-		unis[0][30] = ugtb
-		unis[3][21] = ugtb
-		unis[4][16] = ugtb
-		unis[4][14] = ugtb
-		unis[3][9] = ugtb
-		unis[0][9] = ugtb
-		# Corner
-		unis[0][26] = ugtb
-		
-		hlat.universes = [unis]
+		n = layout.num_rings(self.pitch)
+		gtubes = layout.guide_tube_positions(n, self.guide_tubes)
+		special = dict.fromkeys(gtubes, ugtb)
+		hlat.universes = [layout.make_universes(n, upin, special)]
+		profiling.count("lattice positions", sum(map(len, hlat.universes[0])))
+		profiling.count("guide tubes", len(gtubes))
+		hlat.center = (0, -self.pitch*(n - 1), 0)
 		hlat.outer = upin
+		self._lattices.append((hlat, pincell))
 		print(hlat.show_indices(hlat.num_rings))
 		return hlat
 	
-	def build(self):
-		x0 = openmc.XPlane(x0=0, boundary_type="reflective")
-		
-		right_inner_wall = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
-		                                D=(RAD_MAJ - STEEL_THICK)*cos(pi/6))
-		right_outer_wall = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
-		                                D=RAD_MAJ*cos(pi/6))
-		right_refl_edge = openmc.Plane(boundary_type="reflective",
-		                               A=cos(pi/6), B=cos(pi/3), D=-GAP/2*cos(pi/6)*0)
-		ymin = openmc.YPlane(y0=-RAD_MAJ, boundary_type="vacuum", name="YMIN")
-		
-		zfuel = openmc.ZPlane(z0=WIDTH-STEEL_THICK)
-		zmin = openmc.ZPlane(z0=0, boundary_type="reflective", name="ZMIN")
-		zmax = openmc.ZPlane(z0=WIDTH, boundary_type="vacuum", name="ZMAX")
-		
-		ru = openmc.Universe(name="root universe")
+	def get_axial_zones(self):
+		# (top, (rodded, mod_density)) from the bottom up, with neighbors
+		# that are the same merged into one
+		zfuel = WIDTH - STEEL_THICK
+		zones = list(self.zones)
+		if not zones or zones[-1].top < zfuel:
+			zones.append(AxialZone(zfuel))
+		merged = []
+		for zone in zones:
+			rodded = self.rodded if zone.rodded is None else zone.rodded
+			key = (rodded, zone.mod_density)
+			if merged and merged[-1][1] == key:
+				merged[-1] = (zone.top, key)
+			else:
+				merged.append((zone.top, key))
+		return merged
+	
+	def get_moderator(self, mod_density=None):
+		if mod_density is None:
+			return self.matdict["Mod"]
+		return moderator(mod_density)
+	
+	def get_radial_universe(self, rodded, mod_density=None):
+		# Built once per distinct (rodded, mod_density); every zone that
+		# matches shares the universe, lattice and all
+		key = (rodded, mod_density)
+		if key in self._radial:
+			return self._radial[key]
+		mod_mat = self.get_moderator(mod_density)
+		pincell = self.pincell
+		if mod_mat is not pincell.mod_mat:
+			pincell = Pincell(self.radius, self.clad_type,
+			                  dict(self.matdict, Mod=mod_mat), self.fuel)
+		lattice = self.get_lattice(pincell, GuideTube(pincell, rodded))
+		if self._lattice is None:
+			self._lattice = lattice
+		right_inner_water, right_inner_wall, right_outer_wall = self._walls
 		radialu = openmc.Universe(name="radial universe")
-		self._lattice = self.get_lattice()
-		dist = RAD_MAJ - STEEL_THICK - (sqrt(3)/2)*self.pitch/1.1
-		right_inner_water = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
-		                                 D=dist*cos(pi/6))
-		
 		# Fueled area
 		inner = openmc.Cell()
 		inner.region = -right_inner_water
-		inner.fill = self._lattice
+		inner.fill = lattice
 		radialu.add_cell(inner)
 		# Water buffer
 		buffer = openmc.Cell()
 		buffer.region = +right_inner_water & -right_inner_wall
-		buffer.fill = all_materials["Mod"]
+		buffer.fill = mod_mat
 		radialu.add_cell(buffer)
 		# Reactor pressure vessel
 		rpv = openmc.Cell()
@@ -130,13 +150,49 @@ class Slice3D:
 		outside.region = +right_outer_wall
 		outside.fill = all_materials["Air"]
 		radialu.add_cell(outside)
+		self._radial[key] = radialu
+		return radialu
+	
+	def get_water_distance(self):
+		# Along -y from the core center to the plane between the lattice
+		# and the water buffer
+		return RAD_MAJ - STEEL_THICK - (sqrt(3)/2)*self.pitch/1.1
+	
+	@profiling.timed("build")
+	def build(self):
+		x0 = openmc.XPlane(x0=0, boundary_type="reflective")
+		
+		right_inner_wall = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
+		                                D=(RAD_MAJ - STEEL_THICK)*cos(pi/6))
+		right_outer_wall = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
+		                                D=RAD_MAJ*cos(pi/6))
+		right_refl_edge = openmc.Plane(boundary_type="reflective",
+		                               A=cos(pi/6), B=cos(pi/3), D=-GAP/2*cos(pi/6)*0)
+		ymin = openmc.YPlane(y0=-RAD_MAJ, boundary_type="vacuum", name="YMIN")
+		
+		zfuel = openmc.ZPlane(z0=WIDTH-STEEL_THICK)
+		zmin = openmc.ZPlane(z0=0, boundary_type="reflective", name="ZMIN")
+		zmax = openmc.ZPlane(z0=WIDTH, boundary_type="vacuum", name="ZMAX")
+		
+		ru = openmc.Universe(name="root universe")
+		dist = self.get_water_distance()
+		right_inner_water = openmc.Plane(A=cos(pi/3), B=-cos(pi/6),
+		                                 D=dist*cos(pi/6))
+		self._walls = (right_inner_water, right_inner_wall, right_outer_wall)
+		self._lattice = None
+		self._lattices = []
+		self._radial = {}
 		
 		# Make it axially finite
 		axialu = openmc.Universe()
-		cmain = openmc.Cell()
-		cmain.region = +zmin & -zfuel
-		cmain.fill = radialu
-		axialu.add_cell(cmain)
+		zbot = zmin
+		for top, key in self.get_axial_zones():
+			ztop = zfuel if top == WIDTH - STEEL_THICK else openmc.ZPlane(z0=top)
+			czone = openmc.Cell()
+			czone.region = +zbot & -ztop
+			czone.fill = self.get_radial_universe(*key)
+			axialu.add_cell(czone)
+			zbot = ztop
 		cwall = openmc.Cell()
 		cwall.region = +zfuel & -zmax
 		cwall.fill = self.matdict["SS316"]
@@ -151,22 +207,26 @@ class Slice3D:
 		self._geometry.root_universe = ru
 	
 	def make_tallies(self, folder_name):
+		from openmc import mgxs
 		tals = openmc.Tallies()
 		# 8-group equal-lethargy bin energy tally
 		etal = openmc.Tally()
 		efilter = openmc.EnergyFilter([0] + list(np.logspace(-3, 7, 9)))
 		etal.filters = [efilter]
 		etal.scores = ["flux"]
+		etal.triggers = tally_triggers(self.run_control)
 		tals.append(etal)
 		# MGXS tallies
 		lib = mgxs.Library(self._geometry)
 		lib.energy_groups = mgxs.EnergyGroups([0, 20E6])
-		lib.mgxs_types = ["fission", "capture"]
+		lib.mgxs_types = ["fission", "nu-fission", "capture", "transport"]
 		lib.domain_type = "universe"
 		lib.domains = [self._geometry.root_universe]
 		lib.by_nuclide = True
-		lib.build_library()
-		lib.dump_to_file("mgxs", folder_name)
+		with profiling.stage("mgxs build"):
+			lib.build_library()
+		with profiling.stage("mgxs dump"):
+			lib.dump_to_file("mgxs", folder_name)
 		lib.add_to_tallies_file(tals)
 		return tals
 	
@@ -186,34 +246,106 @@ class Slice3D:
 		p2.origin = [WIDTH/2, -WIDTH/4, WIDTH/2]
 		return [p1]
 	
-	def export_to_xml(self):
-		folder_name = "{clad_type}/radius{radius:.2f}_pitch{pitch:.2f}/".format(**vars(self))
-		if not os.path.isdir(folder_name):
-			os.makedirs(folder_name)
-		self._geometry.export_to_xml(folder_name + "geometry.xml")
-		mfile = openmc.Materials()
-		for mat in all_materials.values():
-			mfile.append(mat)
-		mfile.export_to_xml(folder_name + "materials.xml")
-		pfile = openmc.Plots()
-		pfile += self.make_plots()
-		# noinspection PyTypeChecker
-		for p in pfile:
-			if p.color_by == "material":
-				p.colors = colormap
-		pfile.export_to_xml(folder_name + "plots.xml")
-		tfile = self.make_tallies(folder_name)
-		tfile.export_to_xml(folder_name + "tallies.xml")
-		sfile = openmc.Settings()
-		sfile.particles = 10000
-		sfile.batches = 50
-		sfile.inactive = 20
-		sfile.source = openmc.Source(space=Box([-RAD_MIN/2, -RAD_MAJ, -10], [RAD_MIN/2, 0, 10]))
-		sfile.export_to_xml(folder_name + "settings.xml")
-		print("Exported to:", folder_name)
+	def get_source_box(self):
+		return Box([-RAD_MIN/2, -RAD_MAJ, 0], [RAD_MIN/2, 0, WIDTH - STEEL_THICK])
+	
+	def get_source(self):
+		if self.source_file:
+			return openmc.Source(filename=self.source_file)
+		return openmc.Source(space=self.get_source_box())
+	
+	@property
+	def rodded(self):
+		return self.gtube.rod
+	
+	@property
+	def folder_name(self):
+		return case_folder(self.clad_type, self.radius, self.pitch,
+		                   case_tag(self.fuel, self.zones, self.rodded))
+	
+	def get_materials(self):
+		mats = list(all_materials.values())
+		if self.pincell.fuel_mat not in mats:
+			mats.append(self.pincell.fuel_mat)
+		densities = {zone.mod_density for zone in self.zones}
+		mats += [moderator(d) for d in sorted(densities - {None})]
+		return mats
+	
+	def _cache_keys(self):
+		consts = constants_state()
+		code = source_state(__name__, "pincell", "gap", "layout", "materials",
+		                    "deck_cache", "run_control")
+		# Geometry, tallies and the MGXS library share IDs, so they are always
+		# exported together; the tallies also depend on the run control
+		mats = materials_state(dict(enumerate(self.get_materials())))
+		geom = digest("geometry", self.radius, self.pitch, self.clad_type,
+		              self.rodded, self.fuel, self.zones, consts,
+		              materials_state(self.matdict), mats, code)
+		return {
+			"geometry.xml": geom,
+			"tallies.xml": digest("tallies", geom, self.run_control),
+			"mgxs.pkl": geom,
+			"materials.xml": digest("materials", mats),
+			"plots.xml": digest("plots", consts, colors_state(colormap), code),
+			"settings.xml": digest("settings", self.run_control,
+			                       self.source_file, consts, code),
+		}
+	
+	def export_to_xml(self, force=False):
+		folder_name = self.folder_name
+		os.makedirs(folder_name, exist_ok=True)
+		manifest = Manifest(folder_name)
+		keys = self._cache_keys()
+		stale = [fname for fname, key in keys.items()
+		         if force or not manifest.is_current(fname, key)]
+		if not stale:
+			print("Up to date:", folder_name)
+			profiling.reset()
+			return stale
+		geometry_files = ["geometry.xml", "tallies.xml", "mgxs.pkl"]
+		if set(stale) & set(geometry_files):
+			stale = geometry_files + [f for f in stale if f not in geometry_files]
+			if self._geometry is None:
+				self.build()
+			with profiling.stage("export geometry.xml"):
+				self._geometry.export_to_xml(folder_name + "geometry.xml")
+			with profiling.stage("tallies"):
+				tfile = self.make_tallies(folder_name)
+			with profiling.stage("export tallies.xml"):
+				tfile.export_to_xml(folder_name + "tallies.xml")
+			for fname in geometry_files:
+				manifest.update(fname, keys[fname])
+		if "materials.xml" in stale:
+			mfile = openmc.Materials()
+			for mat in self.get_materials():
+				mfile.append(mat)
+			with profiling.stage("export materials.xml"):
+				mfile.export_to_xml(folder_name + "materials.xml")
+			manifest.update("materials.xml", keys["materials.xml"])
+		if "plots.xml" in stale:
+			pfile = openmc.Plots()
+			pfile += self.make_plots()
+			# noinspection PyTypeChecker
+			for p in pfile:
+				if p.color_by == "material":
+					p.colors = colormap
+			with profiling.stage("export plots.xml"):
+				pfile.export_to_xml(folder_name + "plots.xml")
+			manifest.update("plots.xml", keys["plots.xml"])
+		if "settings.xml" in stale:
+			sfile = openmc.Settings()
+			apply_settings(sfile, self.run_control)
+			sfile.source = self.get_source()
+			# Leave the converged sites for warm starts of other cases
+			sfile.sourcepoint = {"separate": True}
+			with profiling.stage("export settings.xml"):
+				sfile.export_to_xml(folder_name + "settings.xml")
+			manifest.update("settings.xml", keys["settings.xml"])
+		print("Exported to:", folder_name, "({})".format(", ".join(stale)))
+		profiling.flush(folder_name, case=folder_name, exported=stale)
+		return stale
 
 
 if __name__ == '__main__':
 	bar = Slice3D(2.25, 9.8, "SS316", rodded=False)
-	bar.build()
 	bar.export_to_xml()
@@ -0,0 +1,202 @@
+# Surrogate models of keff and stress over the design space
+#
+# Gaussian-process (Matern 3/2 kernel) regression in NumPy. Inputs are scaled
+# to the unit box and outputs to zero mean and unit variance; the kernel
+# width is fit by marginal likelihood within LENGTH_SCALES. Everything that
+# does not depend on the query is factored at fit time, so a prediction is
+# one kernel row and two small matrix products, with a standard deviation
+# that grows away from the data. The squared-exponential kernel is far too
+# sure of itself on the kinked stress surfaces (59% of the errors within 3
+# sigma in the check below); Matern 3/2 is not (about 99%).
+#
+# keff comes from aggregated sweep results (aggregate.py), one surrogate per
+# clad type over (radius, pitch). Clad stress comes from sweep.stress_sweep
+# over (p_fill, r_fuel, t_ratio), and vessel stress from PressureVesselArray
+# over (R, t).
+
+import numpy as np
+from sweep import stress_sweep
+from pressure_vessel import PressureVesselArray
+from vessel_finder import P_OUT
+
+LENGTH_SCALES = (0.05, 1.0)  # bounds of the kernel width, in the unit box
+NUGGET = 1E-8  # relative noise variance that keeps the kernel invertible
+
+
+class Surrogate:
+	def __init__(self, x, y, noise=None, length_scales=LENGTH_SCALES,
+	             bounds=None, log=False):
+		# x: (n, d) inputs; y: (n,) outputs; noise: standard deviations of y
+		# bounds: (lower, upper) of the inputs, by default those of the data
+		# log: fit log(y), for positive outputs that span a wide range
+		self.x = np.array(x, dtype=float).reshape(len(y), -1)
+		self.y = np.array(y, dtype=float)
+		self.noise = None if noise is None else np.broadcast_to(
+			np.asarray(noise, dtype=float), self.y.shape)
+		self.log = log
+		if bounds is None:
+			bounds = self.x.min(axis=0), self.x.max(axis=0)
+		self.lower = np.asarray(bounds[0], dtype=float)
+		span = np.asarray(bounds[1], dtype=float) - self.lower
+		self.span = np.where(span > 0, span, 1.0)
+		self._fit(length_scales)
+	
+	def scale(self, x):
+		return (np.asarray(x, dtype=float).reshape(-1, self.x.shape[1]) -
+		        self.lower)/self.span
+	
+	def _kernel(self, a, b, length_scale=None):
+		d = np.sqrt(((a[:, None, :] - b[None, :, :])**2).sum(axis=-1))
+		s = np.sqrt(3)*d/(length_scale or self.length_scale)
+		return (1 + s)*np.exp(-s)
+	
+	def _likelihood(self, ell, ys, diag):
+		# (log marginal likelihood, Cholesky factor, weights, kernel variance)
+		# at kernel width ell, or None if the kernel is singular there
+		k = self._kernel(self._xs, self._xs, ell)
+		k[np.diag_indices_from(k)] += diag
+		try:
+			chol = np.linalg.cholesky(k)
+		except np.linalg.LinAlgError:
+			return None
+		alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, ys))
+		# Kernel variance at its most likely value for this width
+		variance = max(ys @ alpha/len(ys), NUGGET)
+		log_like = (-0.5*len(ys)*np.log(variance) -
+		            np.log(np.diag(chol)).sum())
+		return log_like, chol, alpha, variance
+	
+	def _fit(self, length_scales):
+		# length_scales: (shortest, longest) kernel width to fit within
+		xs = self.scale(self.x)
+		y = np.log(self.y) if self.log else self.y
+		self.y_mean = y.mean()
+		self.y_scale = y.std() or 1.0
+		ys = (y - self.y_mean)/self.y_scale
+		diag = np.full(len(ys), NUGGET)
+		if self.noise is not None:
+			noise = self.noise/self.y if self.log else self.noise
+			diag += (noise/self.y_scale)**2
+		self._xs = xs
+		lo, hi = length_scales
+		self.length_scale = lo
+		if hi > lo:
+			from scipy.optimize import minimize_scalar
+			
+			def cost(log_ell):
+				fit = self._likelihood(np.exp(log_ell), ys, diag)
+				return np.inf if fit is None else -fit[0]
+			
+			best = minimize_scalar(cost, bounds=np.log(length_scales),
+			                       method="bounded")
+			self.length_scale = float(np.exp(best.x))
+		fit = self._likelihood(self.length_scale, ys, diag)
+		if fit is None:
+			raise ValueError("Kernel is singular at length scale {:g}".format(
+				self.length_scale))
+		_, chol, self._alpha, self.variance = fit
+		chol_inv = np.linalg.inv(chol)
+		self._k_inv = chol_inv.T @ chol_inv
+	
+	def predict(self, x, return_std=True):
+		ks = self._kernel(self.scale(x), self._xs)
+		mean = ks @ self._alpha*self.y_scale + self.y_mean
+		if self.log:
+			mean = np.exp(mean)
+		if not return_std:
+			return mean
+		var = self.variance*(1 - ((ks @ self._k_inv)*ks).sum(axis=1))
+		std = np.sqrt(np.maximum(var, 0))*self.y_scale
+		# To first order, for a log fit
+		return mean, std*mean if self.log else std
+	
+	def with_points(self, x, y):
+		# The same surrogate, kernel width and all, with more data
+		x = np.asarray(x, dtype=float).reshape(-1, self.x.shape[1])
+		noise = self.noise
+		if noise is not None:
+			noise = np.concatenate([noise, np.zeros(len(x))])
+		return Surrogate(np.vstack([self.x, x]), np.append(self.y, y), noise,
+		                 (self.length_scale,)*2, (self.lower, self.lower + self.span),
+		                 self.log)
+	
+	def propose(self, candidates, k=1):
+		# Indices of k candidates to simulate next: the least certain one, then
+		# the least certain once that one is assumed known at its prediction,
+		# and so on, so the picks spread out instead of bunching up
+		candidates = self.scale(candidates)*self.span + self.lower
+		model = self
+		picks = []
+		for _ in range(min(k, len(candidates))):
+			mean, std = model.predict(candidates)
+			std[picks] = -1
+			i = int(np.argmax(std))
+			picks.append(i)
+			model = model.with_points(candidates[i], mean[i])
+		return picks
+
+
+def grid_points(*axes):
+	# Every combination of the axes values, as (n, len(axes)) points
+	grids = np.meshgrid(*axes, indexing="ij")
+	return np.stack(grids, axis=-1).reshape(-1, len(axes))
+
+
+def keff_surrogate(results, clad_type):
+	# Over (radius, pitch), from aggregate.load_results(); untagged
+	# cases only
+	rows = ((results["clad_type"] == clad_type) &
+	        (results["tag"] == "") & np.isfinite(results["keff"]))
+	if not rows.any():
+		raise KeyError("No {} results".format(clad_type))
+	x = np.column_stack([results["radius"][rows], results["pitch"][rows]])
+	return Surrogate(x, results["keff"][rows], results["keff_std"][rows])
+
+
+def stress_surrogate(p_fill, r_fuel, t_ratio, p_out=P_OUT):
+	# Max clad stress over (p_fill, r_fuel, t_ratio), fit to a stress_sweep
+	stress = stress_sweep(p_fill, r_fuel, t_ratio, (p_out,))[..., 0].ravel()
+	x = grid_points(p_fill, r_fuel, t_ratio)
+	valid = np.isfinite(stress)
+	return Surrogate(x[valid], stress[valid], log=True)
+
+
+def vessel_surrogate(radii, thicknesses, p_i, p_o):
+	# Max vessel stress over (R, t)
+	x = grid_points(radii, thicknesses)
+	stress = PressureVesselArray(x[:, 0], x[:, 1], p_i, p_o).get_max_stress()
+	return Surrogate(x, stress, log=True)
+
+
+def propose_cases(results, clad_type, radii, pitches, k=4):
+	# (radius, pitch) of the k cases, out of the radii x pitches grid, where
+	# the keff surrogate is least certain
+	from deck_sweep import Case
+	model = keff_surrogate(results, clad_type)
+	candidates = grid_points(radii, pitches)
+	return [Case(float(candidates[i, 0]), float(candidates[i, 1]), clad_type)
+	        for i in model.propose(candidates, k)]
+
+
+if __name__ == "__main__":
+	import time
+	p_fill = np.linspace(0.69, 8, 6)
+	r_fuel = np.linspace(1.0, 2.0, 5)
+	t_ratio = np.linspace(0.02, 0.10, 5)
+	model = stress_surrogate(p_fill, r_fuel, t_ratio)
+	print("Fit to {} points, length scale {}".format(len(model.y),
+	                                                  model.length_scale))
+	fine = grid_points(np.linspace(0.69, 8, 15), np.linspace(1.0, 2.0, 15),
+	                   np.linspace(0.02, 0.10, 15))
+	truth = stress_sweep(*(np.unique(col) for col in fine.T))[..., 0].ravel()
+	mean, std = model.predict(fine)
+	valid = np.isfinite(truth)
+	err = abs(mean - truth)[valid]
+	print("Error on a finer grid: median {:.2f} MPa, max {:.2f} MPa".format(
+		np.median(err), err.max()))
+	print("Within 3 sigma: {:.0%}".format(np.mean(err <= 3*std[valid] + 1E-9)))
+	t0 = time.perf_counter()
+	for _ in range(1000):
+		model.predict([4, 1.5, 0.05])
+	print("One query: {:.0f} us".format((time.perf_counter() - t0)*1E3))
+	print("Next points:", fine[model.propose(fine, 3)])
@@ -0,0 +1,42 @@
+# Design-space sweep
+
+import numpy as np
+from constants import CLADS, CLAD_YIELDS
+from gap import solve_rgap
+from pressure_vessel import PressureVesselArray, ThickWallVesselArray
+from vessel_finder import P_OUT
+
+
+def max_stress(p_fill, r_fuel, t_ratio, p_out=P_OUT, thick=False):
+	"""Max clad stress and gap radius, broadcast over the arguments
+	
+	The gap is sized so the swollen fuel brings the fill gas up to p_out,
+	and the worst of the BOL and swollen states is kept. Points with no
+	valid gap (p_fill >= p_out) are nan. thick: use the peak Lame stress
+	through the wall instead of the thin-wall formulas.
+	"""
+	rg = solve_rgap(r_fuel, p_fill, p_out, strict=False)
+	t = np.asarray(t_ratio, dtype=float)*rg
+	if thick:
+		stress = ThickWallVesselArray(rg, t, p_fill, p_out).get_peak()[0]
+		swollen = ThickWallVesselArray(rg, t, p_out, p_out).get_peak()[0]
+		return np.maximum(stress, swollen, out=stress), rg
+	stress = PressureVesselArray(rg, t, p_fill, p_out).get_max_stress()
+	swollen = PressureVesselArray(rg, t, p_out, p_out)
+	return np.maximum(stress, swollen.get_max_stress(), out=stress), rg
+
+
+def stress_sweep(p_fill, r_fuel, t_ratio, p_out=(P_OUT,), thick=False):
+	# max_stress over the grid (p_fill, r_fuel, t_ratio, p_out)
+	p0 = np.asarray(p_fill, dtype=float)[:, None, None, None]
+	rf = np.asarray(r_fuel, dtype=float)[None, :, None, None]
+	tr = np.asarray(t_ratio, dtype=float)[None, None, :, None]
+	po = np.asarray(p_out, dtype=float)[None, None, None, :]
+	return max_stress(p0, rf, tr, po, thick)[0]
+
+
+def yield_sweep(p_fill, r_fuel, t_ratio, clads=CLADS, p_out=(P_OUT,)):
+	# Fraction of clad yield, shape (clad, p_fill, r_fuel, t_ratio, p_out)
+	yields = np.array([CLAD_YIELDS[c] for c in clads], dtype=float)
+	stress = stress_sweep(p_fill, r_fuel, t_ratio, p_out)
+	return stress[None]/yields[:, None, None, None, None]
@@ -0,0 +1,134 @@
+# Fission-source warm starts between sweep cases
+#
+# A new case starts from the converged fission sites of the nearest finished
+# case: same clad type and tag, closest in (radius, pitch). Their pin
+# lattices share the core-relative (q, s) positions, so each site moves to
+# the same pin of the new lattice, with its offset from the pin center
+# scaled by the ratio of fuel radii. Sites whose pin falls outside the new
+# fueled area are dropped. A warm-started case needs only WARM_INACTIVE
+# inactive batches.
+#
+# The sites come from the finished case's source.*.h5 (see the slices'
+# sourcepoint setting), or from its last statepoint, and the mapped sites
+# go to WARM_SOURCE in the new case folder. Only new cases are seeded: a
+# case keeps the warm source it already has, and a case that has run from
+# a cold start stays cold, so re-running a grown sweep leaves their decks
+# (and runs) current.
+
+import os
+import glob
+import numpy as np
+import layout
+from deck_cache import Manifest, digest, parse_case_folder
+
+WARM_SOURCE = "warm_source.h5"
+WARM_INACTIVE = 5
+
+
+def _batch(path):
+	return int(path.split(".")[-2])
+
+
+def finished_sources(root="."):
+	# {case folder: file with its converged fission sites}
+	found = {}
+	for folder in glob.glob(os.path.join(root, "*", "*", "")):
+		if parse_case_folder(folder) is None:
+			continue
+		for pattern in ("source.*.h5", "statepoint.*.h5"):
+			files = [f for f in glob.glob(os.path.join(folder, pattern))
+			         if f.split(".")[-2].isdigit()]
+			if files:
+				found[os.path.normpath(folder)] = max(files, key=_batch)
+				break
+	return found
+
+
+def nearest_finished(model, finished):
+	# (folder, parsed case) of the closest finished case like `model`: same
+	# clad type and tag (rods, fuel, zones), but not the same case; or None
+	target = parse_case_folder(model.folder_name)
+	key = (target["clad_type"], target["tag"])
+	best = None
+	for folder in finished:
+		case = parse_case_folder(folder)
+		if (case["clad_type"], case["tag"]) != key or \
+				(case["radius"], case["pitch"]) == (target["radius"], target["pitch"]):
+			continue
+		distance = np.hypot(case["radius"]/model.radius - 1,
+		                    case["pitch"]/model.pitch - 1)
+		if best is None or distance < best[0]:
+			best = (distance, folder, case)
+	return None if best is None else best[1:]
+
+
+def map_sites(xyz, old, new, water_distance):
+	"""Move fission sites from one (radius, pitch) lattice to another
+
+	xyz: (n, 3) positions. Returns the mapped positions and a mask of the
+	sites kept, whose pins are inside `water_distance` of the new slice.
+	"""
+	r0, p0 = old
+	r1, p1 = new
+	x, y = xyz[:, 0], xyz[:, 1]
+	n0 = layout.num_rings(p0)
+	q, r = layout.point_to_axial(x, y, p0, n0)
+	x0, y0 = layout.axial_to_point(q, r, p0, n0)
+	# Pin centers scale with the pitch about the core center
+	x1 = x0*p1/p0
+	y1 = y0*p1/p0
+	scale = r1/r0
+	mapped = np.column_stack([x1 + (x - x0)*scale, y1 + (y - y0)*scale, xyz[:, 2]])
+	# Distance from the core center normal to the vessel wall facing the slice
+	keep = 0.5*x1 - np.sqrt(3)/2*y1 < water_distance*np.sqrt(3)/2
+	return mapped, keep
+
+
+def read_sites(path):
+	import h5py
+	with h5py.File(path, "r") as f:
+		return f["source_bank"][()]
+
+
+def write_sites(path, sites):
+	import h5py
+	with h5py.File(path, "w") as f:
+		f.attrs["filetype"] = np.bytes_("source")
+		f.create_dataset("source_bank", data=sites)
+
+
+def prepare(model, root="."):
+	"""Write a warm-start source for `model` into its case folder
+
+	Returns (source file name, folder it came from), or None if no similar
+	case has finished. The source is recorded in the case's manifest, so
+	runs from an older source count as stale. A case with a warm source
+	keeps it (the folder is then None), and one that has run without one
+	gets None.
+	"""
+	target = os.path.join(root, model.folder_name)
+	if os.path.exists(os.path.join(target, WARM_SOURCE)):
+		return WARM_SOURCE, None
+	finished = finished_sources(root)
+	if os.path.normpath(target) in finished:
+		return None
+	neighbor = nearest_finished(model, finished)
+	if neighbor is None:
+		return None
+	folder, case = neighbor
+	sites = read_sites(finished[folder])
+	xyz = np.stack([sites["r"][c] for c in "xyz"], axis=-1)
+	mapped, keep = map_sites(xyz, (case["radius"], case["pitch"]),
+	                         (model.radius, model.pitch),
+	                         model.get_water_distance())
+	if not keep.any():
+		return None
+	sites = sites[keep]
+	for i, c in enumerate("xyz"):
+		sites["r"][c] = mapped[keep, i]
+	os.makedirs(target, exist_ok=True)
+	write_sites(os.path.join(target, WARM_SOURCE), sites)
+	source = finished[folder]
+	Manifest(target).update(WARM_SOURCE, digest(
+		os.path.relpath(source, root), os.path.getmtime(source)))
+	return WARM_SOURCE, folder